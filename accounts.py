@@ -0,0 +1,55 @@
+import json
+import os
+
+from positions import PositionBook
+from signals import STRATEGY
+
+
+class Account:
+    # Окремий рахунок/стратегія: свій клієнт біржі, позиції та cooldown; PnL - у журналі.
+    # Свічки, індикатори та тікери спільні для всіх рахунків у процесі
+    def __init__(self, name, exchange, order_size, leverage, max_positions,
+                 min_profit_percent, cooldown, strategy=None, api_key=None, api_secret=None):
+        self.name = name
+        self.exchange = exchange
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.order_size = float(order_size)
+        self.leverage = int(leverage)
+        self.max_positions = int(max_positions)
+        self.min_profit_percent = float(min_profit_percent)
+        self.cooldown = int(cooldown)
+        self.strategy = {**STRATEGY, **(strategy or {})}
+        self.position_book = PositionBook()
+        self.executions_synced_at = 0
+        self.last_entry_time = {}
+        self.leverage_ready = set()
+        self.tag = ""
+
+    @property
+    def notional(self):
+        return self.order_size * self.leverage
+
+    @property
+    def full(self):
+        return len(self.position_book) >= self.max_positions
+
+
+def load_accounts(path, defaults, make_exchange):
+    # JSON-список рахунків; ключі API беруться зі змінних оточення за іменами
+    # api_key_env/api_secret_env, щоб не зберігати секрети у файлі
+    with open(path, encoding="utf-8") as f:
+        configs = json.load(f)
+    accounts = []
+    for i, config in enumerate(configs):
+        api_key = os.getenv(config.get("api_key_env", "API_KEY"))
+        api_secret = os.getenv(config.get("api_secret_env", "API_SECRET"))
+        settings = {key: config.get(key, value) for key, value in defaults.items()}
+        accounts.append(Account(
+            config.get("name", f"account-{i + 1}"), make_exchange(api_key, api_secret),
+            strategy=config.get("strategy"), api_key=api_key, api_secret=api_secret, **settings,
+        ))
+    if len(accounts) > 1:
+        for account in accounts:
+            account.tag = f"[{account.name}] "
+    return accounts
@@ -0,0 +1,265 @@
+import argparse
+import heapq
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from candles import COLUMNS, CandleArchive, filename_symbol
+from clock import now
+from indicators import indicator_arrays
+from signals import FEATURES, F, STRATEGY, adaptive_windows, entry_masks, exit_mask, tp_sl_percent
+
+load_dotenv()
+
+MIN_HISTORY = 220
+TAKER_FEE = 0.00055
+
+
+def default_params(timeframe=None):
+    timeframe = timeframe or os.getenv("TIMEFRAME", "5m")
+    atr_window, rsi_window, _ = adaptive_windows(timeframe)
+    return {
+        **STRATEGY,
+        "timeframe": timeframe,
+        "order_size": float(os.getenv("ORDER_SIZE_USDT", "8.0")),
+        "leverage": int(os.getenv("LEVERAGE", "15")),
+        "max_positions": int(os.getenv("MAX_POSITIONS", "5")),
+        "cooldown": int(os.getenv("COOLDOWN_SECONDS", "120")),
+        "min_profit_percent": float(os.getenv("MIN_PROFIT_PERCENT", "0.3")),
+        "fee": TAKER_FEE,
+        "atr_window": atr_window,
+        "rsi_window": rsi_window,
+    }
+
+
+def load_csv_dir(path):
+    import pandas as pd
+    data = {}
+    for name in sorted(os.listdir(path)):
+        if not name.endswith(".csv"):
+            continue
+        df = pd.read_csv(os.path.join(path, name))
+        data[filename_symbol(name[:-4])] = df[COLUMNS].to_numpy(dtype=np.float64)
+    return data
+
+
+def load_data(path, timeframe):
+    # Архів свічок бота (<path>/<timeframe>/<пара>/*.f64) або каталог CSV
+    archive = CandleArchive(path)
+    symbols = archive.symbols(timeframe)
+    if symbols:
+        return {symbol: archive.read(symbol, timeframe) for symbol in symbols}
+    return load_csv_dir(path)
+
+
+def download(symbols, timeframe, days, path):
+    import ccxt
+    exchange = ccxt.bybit({"enableRateLimit": True})
+    archive = CandleArchive(path)
+    cutoff = exchange.milliseconds() - exchange.parse_timeframe(timeframe) * 1000
+    for symbol in symbols:
+        since = archive.last_timestamp(symbol, timeframe)
+        since = since + 1 if since is not None else exchange.milliseconds() - days * 86400 * 1000
+        bars = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=since, params={"paginate": True})
+        added = archive.append(symbol, timeframe, [b for b in bars if b[0] <= cutoff])
+        print(f"{now()} 💾 {symbol}: +{added} свічок")
+
+
+def feature_matrix(candles, params):
+    _, open_, high, low, close, volume = candles.T
+    ind = indicator_arrays(high, low, close, volume, params["rsi_window"], params["atr_window"])
+    X = np.empty((len(candles), len(FEATURES)), dtype=np.float64)
+    X[:, F["open"]] = open_
+    X[:, F["close"]] = close
+    X[:, F["prev_close"]] = np.concatenate(([np.nan], close[:-1]))
+    X[:, F["volume"]] = volume
+    for name, values in ind.items():
+        X[:, F[name]] = values
+    return X
+
+
+def first_exit(high, low, close, exits, start, tp, sl, side, chunk=256):
+    # Перша свічка після входу з TP/SL або exit-сигналом; шукаємо блоками,
+    # щоб не перебирати весь масив для кожної угоди
+    n = len(close)
+    while start < n:
+        end = min(n, start + chunk)
+        if side == "LONG":
+            hit_tp, hit_sl = high[start:end] >= tp, low[start:end] <= sl
+        else:
+            hit_tp, hit_sl = low[start:end] <= tp, high[start:end] >= sl
+        hits = np.flatnonzero(hit_tp | hit_sl | exits[start:end])
+        if len(hits):
+            k = hits[0]
+            if hit_sl[k]:
+                # TP і SL в одній свічці: песимістично вважаємо, що першим спрацював SL
+                return start + k, sl, "SL"
+            if hit_tp[k]:
+                return start + k, tp, "TP"
+            return start + k, close[start + k], "EXIT signal"
+        start = end
+        chunk *= 4
+    return n - 1, close[n - 1], "end"
+
+
+def prepare_symbol(candles, params, X=None):
+    if X is None:
+        X = feature_matrix(candles, params)
+    long_mask, short_mask = entry_masks(X, params)
+    warm = np.arange(len(candles)) >= MIN_HISTORY - 1
+    return {
+        "candles": candles,
+        "X": X,
+        "long": long_mask & warm,
+        "short": short_mask & warm,
+        "long_exit": exit_mask(X, True),
+        "short_exit": exit_mask(X, False),
+    }
+
+
+def simulate_trade(sym, i, side, params):
+    candles = sym["candles"]
+    high = candles[:, 2]
+    low = candles[:, 3]
+    close = candles[:, 4]
+    price = close[i]
+    tp_percent, sl_percent = tp_sl_percent(price, sym["X"][i, F["ATR"]], params["min_profit_percent"], params)
+    if side == "LONG":
+        tp = price * (1 + tp_percent / 100)
+        sl = price * (1 - sl_percent / 100)
+        exits = sym["long_exit"]
+    else:
+        tp = price * (1 - tp_percent / 100)
+        sl = price * (1 + sl_percent / 100)
+        exits = sym["short_exit"]
+
+    j, exit_price, reason = first_exit(high, low, close, exits, i + 1, tp, sl, side)
+
+    notional = params["order_size"] * params["leverage"]
+    direction = 1 if side == "LONG" else -1
+    gross = (exit_price - price) / price * notional * direction
+    fees = notional * params["fee"] + notional * exit_price / price * params["fee"]
+    return j, exit_price, reason, gross - fees, fees
+
+
+def run_backtest(data, params=None, prepared=None):
+    params = params or default_params()
+    prepared = prepared or {symbol: prepare_symbol(candles, params) for symbol, candles in data.items()}
+
+    candidates = []
+    for symbol, sym in prepared.items():
+        for side, mask in (("LONG", sym["long"]), ("SHORT", sym["short"])):
+            for i in np.flatnonzero(mask):
+                candidates.append((sym["candles"][i, 0], symbol, int(i), side))
+    candidates.sort()
+
+    open_heap = []
+    busy_until = {}
+    last_entry = {}
+    trades = []
+    cooldown_ms = params["cooldown"] * 1000
+
+    for ts, symbol, i, side in candidates:
+        while open_heap and open_heap[0][0] <= ts:
+            heapq.heappop(open_heap)
+        if len(open_heap) >= params["max_positions"]:
+            continue
+        if busy_until.get(symbol, -1) >= ts:
+            continue
+        if symbol in last_entry and ts - last_entry[symbol] < cooldown_ms:
+            continue
+
+        sym = prepared[symbol]
+        j, exit_price, reason, pnl, fees = simulate_trade(sym, i, side, params)
+        exit_ts = sym["candles"][j, 0]
+        heapq.heappush(open_heap, (exit_ts, symbol))
+        busy_until[symbol] = exit_ts
+        last_entry[symbol] = ts
+        trades.append({
+            "symbol": symbol,
+            "side": side,
+            "entry_time": ts,
+            "exit_time": exit_ts,
+            "entry_price": sym["candles"][i, 4],
+            "exit_price": exit_price,
+            "reason": reason,
+            "pnl": pnl,
+            "fees": fees,
+        })
+
+    return trades, summarize(trades)
+
+
+def summarize(trades):
+    if not trades:
+        return {"total_trades": 0, "winning_trades": 0, "total_pnl": 0.0, "winrate": 0.0,
+                "max_drawdown": 0.0, "profit_factor": 0.0, "fees": 0.0}
+    by_exit = sorted(trades, key=lambda t: t["exit_time"])
+    pnl = np.array([t["pnl"] for t in by_exit])
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity
+    wins = pnl[pnl > 0].sum()
+    losses = -pnl[pnl <= 0].sum()
+    return {
+        "total_trades": len(trades),
+        "winning_trades": int((pnl > 0).sum()),
+        "total_pnl": float(pnl.sum()),
+        "winrate": float((pnl > 0).mean() * 100),
+        "max_drawdown": float(drawdown.max()),
+        "profit_factor": float(wins / losses) if losses > 0 else float("inf"),
+        "fees": float(sum(t["fees"] for t in trades)),
+    }
+
+
+def print_summary(stats, elapsed=None):
+    print(f"\n{'='*60}")
+    print("📊 РЕЗУЛЬТАТ БЕКТЕСТУ:")
+    print(f"{'='*60}")
+    print(f"Всього угод: {stats['total_trades']}")
+    print(f"Прибуткових: {stats['winning_trades']} | Збиткових: {stats['total_trades'] - stats['winning_trades']}")
+    print(f"Winrate: {stats['winrate']:.2f}%")
+    print(f"Загальний PnL: {stats['total_pnl']:+.2f} USDT (комісії: {stats['fees']:.2f} USDT)")
+    print(f"Profit factor: {stats['profit_factor']:.2f}")
+    print(f"Макс. просадка: {stats['max_drawdown']:.2f} USDT")
+    if elapsed is not None:
+        print(f"Час: {elapsed:.1f}с")
+    print(f"{'='*60}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бектест стратегії на збережених свічках")
+    sub = parser.add_subparsers(dest="command")
+    run = sub.add_parser("run")
+    run.add_argument("--data", default="candles")
+    run.add_argument("--timeframe", default=None)
+    run.add_argument("--trades", default=None, help="CSV для списку угод")
+    dl = sub.add_parser("download")
+    dl.add_argument("--symbols", required=True)
+    dl.add_argument("--timeframe", default="1m")
+    dl.add_argument("--days", type=int, default=30)
+    dl.add_argument("--data", default="candles")
+    args = parser.parse_args()
+
+    if args.command == "download":
+        download(args.symbols.split(","), args.timeframe, args.days, args.data)
+        return
+
+    if args.command != "run":
+        parser.print_help()
+        return
+
+    started = time.time()
+    params = default_params(args.timeframe)
+    data = load_data(args.data, params["timeframe"])
+    print(f"{now()} 📂 Завантажено {len(data)} пар, {sum(len(c) for c in data.values())} свічок")
+    trades, stats = run_backtest(data, params)
+    if args.trades:
+        import pandas as pd
+        pd.DataFrame(trades).to_csv(args.trades, index=False)
+    print_summary(stats, time.time() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from clock import now
+
+BASELINE_PATH = "bench_baseline.json"
+SIZES = [100, 500, 1000]
+STAGES = ["fetch_indicators", "rate_limit_wait", "rest_ohlcv", "indicators_update", "signal_batch", "exit_batch"]
+# Метрики, де більше - гірше (для перевірки регресій)
+CHECKED = ["import_seconds", "scan_cold_seconds", "scan_warm_seconds", "peak_rss_mb"]
+# Абсолютний запас, щоб шум на коротких вимірах не давав хибних регресій
+SLACK = {"import_seconds": 0.2, "scan_cold_seconds": 0.05, "scan_warm_seconds": 0.01, "peak_rss_mb": 10}
+
+
+class FakeExchange:
+    # Замість ccxt.bybit: детерміновані синтетичні (або збережені в архіві) свічки
+    # для N пар, без мережі. latency імітує час відповіді REST
+    def __init__(self, symbols, timeframe, history, latency=0.0, data=None):
+        import ccxt
+        self._ccxt = ccxt.bybit()
+        self.symbols = symbols
+        self.timeframe_ms = self._ccxt.parse_timeframe(timeframe) * 1000
+        self.history = history
+        self.latency = latency
+        self.data = data or {}
+        self.candles = {}
+        self.calls = 0
+
+    def parse_timeframe(self, timeframe):
+        return self._ccxt.parse_timeframe(timeframe)
+
+    def market(self, symbol):
+        return {"id": symbol.split("/")[0] + "USDT", "symbol": symbol}
+
+    def _series(self, symbol):
+        series = self.candles.get(symbol)
+        if series is not None:
+            return series
+        current = int(time.time() * 1000) // self.timeframe_ms * self.timeframe_ms
+        if symbol in self.data:
+            # Збережені свічки зсуваються в часі так, щоб остання була поточною
+            series = np.array(self.data[symbol][-self.history * 2:], dtype=np.float64)
+            series[:, 0] = current - (len(series) - 1 - np.arange(len(series))) * self.timeframe_ms
+        else:
+            count = self.history * 2
+            rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+            open_ = np.concatenate(([close[0]], close[:-1]))
+            spread = np.abs(rng.normal(0, 0.001, count)) * close
+            series = np.column_stack([
+                current - (count - 1 - np.arange(count)) * self.timeframe_ms,
+                open_,
+                np.maximum(open_, close) + spread,
+                np.minimum(open_, close) - spread,
+                close,
+                rng.lognormal(8, 1, count),
+            ])
+        self.candles[symbol] = series
+        return series
+
+    def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None, params=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        series = self._series(symbol)
+        if since is not None:
+            series = series[np.searchsorted(series[:, 0], since):]
+            if limit:
+                series = series[:limit]
+        elif limit:
+            series = series[-limit:]
+        return series.tolist()
+
+    def fetch_tickers(self, symbols=None, params=None):
+        self.calls += 1
+        tickers = {}
+        for symbol in self.symbols:
+            series = self._series(symbol)
+            last = series[-1, 4]
+            day = series[-1440:]
+            tickers[symbol] = {
+                "symbol": symbol, "last": last, "bid": last * 0.9999, "ask": last * 1.0001,
+                "high": day[:, 2].max(), "low": day[:, 3].min(),
+                "quoteVolume": float((day[:, 4] * day[:, 5]).sum()),
+            }
+        return tickers
+
+
+def stage_stats(metrics):
+    result = {}
+    for name in STAGES:
+        histogram = metrics.histograms.get(name)
+        if histogram is None:
+            continue
+        counts, total, count = histogram.snapshot()
+        if count == 0:
+            continue
+        result[name] = {
+            "count": count,
+            "avg_ms": total / count * 1000,
+            "p50_ms": metrics.quantile(counts, 0.5) * 1000,
+            "p95_ms": metrics.quantile(counts, 0.95) * 1000,
+        }
+    return result
+
+
+def run_scan(main, symbols):
+    pending = []
+    for symbol, snapshot in main.scan_market(symbols):
+        if snapshot is not None and snapshot[2] >= 220 and snapshot[1] is not None:
+            pending.append((symbol, snapshot[0], snapshot[1]))
+    found = main.batch_signals(pending)
+    exits = main.batch_exits(pending[:main.MAX_POSITIONS], main.accounts[0].position_book)
+    return len(pending), len(found), len(exits)
+
+
+def run_child(args):
+    # Окремий процес на кожен розмір: чиста пам'ять і чесний пік RSS
+    os.environ.update({
+        "TIMEFRAME": args.timeframe,
+        "CANDLE_ARCHIVE_DIR": "",
+        "JOURNAL_PATH": "",
+        "MARKETS_CACHE_PATH": "",
+        "USE_WEBSOCKET": "False",
+        "TELEGRAM_BOT_TOKEN": "",
+        "SCAN_WORKERS": str(args.workers),
+    })
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+        import metrics
+    import_seconds = time.perf_counter() - started
+    data = None
+    if args.data:
+        from backtest import load_data
+        data = load_data(args.data, args.timeframe)
+    symbols = [f"B{i:04d}/USDT:USDT" for i in range(args.symbols)]
+    if data:
+        names = sorted(data)
+        symbols = [names[i % len(names)] if i < len(names) else f"{names[i % len(names)]}#{i}" for i in range(args.symbols)]
+        data = {s: data[s.split("#")[0]] for s in symbols}
+
+    fake = FakeExchange(symbols, args.timeframe, main.HISTORY_LIMIT, args.latency / 1000, data)
+    # Та сама обгортка, що й у боті, але без ліміту швидкості
+    main.market_data = main.ResilientExchange(fake, {"market": main.RateLimiter(1e9)}, main.scan_breaker)
+    main.exit_data = main.ResilientExchange(fake, {"market": main.RateLimiter(1e9)}, main.scan_breaker)
+    metrics.enable()
+    for symbol in symbols:
+        fake._series(symbol)
+
+    result = {"symbols": args.symbols, "timeframe": args.timeframe, "workers": args.workers,
+              "latency_ms": args.latency, "import_seconds": import_seconds}
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        main.select_universe(symbols)
+        result["universe_seconds"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result["ready"], result["signals"], _ = run_scan(main, symbols)
+        result["scan_cold_seconds"] = time.perf_counter() - started
+        result["stages_cold"] = stage_stats(metrics)
+
+        metrics.histograms.clear()
+        warm = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            run_scan(main, symbols)
+            warm.append(time.perf_counter() - started)
+        result["scan_warm_seconds"] = float(np.median(warm))
+        result["stages_warm"] = stage_stats(metrics)
+
+        if args.legacy:
+            # Старий шлях DataFrame + ta на частині пар, для порівняння
+            subset = symbols[:min(100, len(symbols))]
+            started = time.perf_counter()
+            for symbol in subset:
+                df = main.calculate_indicators(main.fetch_ohlcv(symbol))
+                main.signal(df, symbol)
+            result["legacy_per_symbol_ms"] = (time.perf_counter() - started) / len(subset) * 1000
+
+    result["throughput_cold"] = args.symbols / result["scan_cold_seconds"]
+    result["throughput_warm"] = args.symbols / result["scan_warm_seconds"]
+    result["requests"] = fake.calls
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+
+def run_size(args, size):
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--symbols", str(size),
+               "--timeframe", args.timeframe, "--workers", str(args.workers), "--rounds", str(args.rounds),
+               "--latency", str(args.latency)]
+    if args.data:
+        command += ["--data", args.data]
+    if args.legacy:
+        command.append("--legacy")
+    output = subprocess.run(command, check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for result in results:
+        base = baseline.get(str(result["symbols"]))
+        if base is None:
+            continue
+        for key in CHECKED:
+            if base.get(key) and result[key] > base[key] * (1 + tolerance) + SLACK[key]:
+                regressions.append(f"{result['symbols']} пар: {key} {result[key]:.3f} > {base[key]:.3f} (+{tolerance:.0%})")
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'='*78}")
+    print(f"{'пар':>6} {'імпорт':>8} {'холодний':>10} {'теплий':>10} {'пар/с (теплий)':>15} {'запитів':>9} {'пік RSS':>10}")
+    print(f"{'='*78}")
+    for r in results:
+        print(f"{r['symbols']:>6} {r['import_seconds']:>7.2f}с {r['scan_cold_seconds']:>9.2f}с {r['scan_warm_seconds']:>9.3f}с "
+              f"{r['throughput_warm']:>15.0f} {r['requests']:>9} {r['peak_rss_mb']:>8.0f}MB")
+    for r in results:
+        print(f"\n⏱ {r['symbols']} пар, етапи (теплий скан):")
+        for name, s in r["stages_warm"].items():
+            print(f"  • {name:<20} n={s['count']:<6} avg={s['avg_ms']:7.3f}ms p50={s['p50_ms']:7.3f}ms p95={s['p95_ms']:7.3f}ms")
+        if "legacy_per_symbol_ms" in r:
+            print(f"  • DataFrame + ta (старий шлях): {r['legacy_per_symbol_ms']:.2f}ms на пару")
+    print(f"{'='*78}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк скану на фейковій біржі без мережі")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--timeframe", default="1m")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5, help="кількість теплих сканів (медіана)")
+    parser.add_argument("--latency", type=float, default=0.0, help="імітація затримки REST, мс")
+    parser.add_argument("--data", default=None, help="архів/CSV зі збереженими свічками замість синтетичних")
+    parser.add_argument("--legacy", action="store_true", help="також виміряти шлях DataFrame + ta")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="код виходу 1 при регресії відносно базових значень")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", default=None, help="JSON з результатами")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--symbols", type=int, default=100, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        print(f"{now()} 🏁 {size} пар...")
+        results.append(run_size(args, size))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline.update({str(r["symbols"]): {key: r[key] for key in CHECKED} for r in results})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"{now()} 💾 Базові значення збережено в {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"{now()} 🔻 Регресія: {line}")
+    if not regressions and baseline:
+        print(f"{now()} ✅ Без регресій відносно {args.baseline}")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import os
+import threading
+import numpy as np
+
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+class CandleBuffer:
+    def __init__(self, size):
+        self.size = size
+        self.data = np.zeros((size * 2, len(COLUMNS)), dtype=np.float64)
+        self.start = 0
+        self.end = 0
+        self.generation = 0
+        self.streamed_at = 0.0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def last_timestamp(self):
+        if self.end == self.start:
+            return None
+        return int(self.data[self.end - 1, 0])
+
+    def view(self, limit=None):
+        start = self.start if limit is None else max(self.start, self.end - limit)
+        return self.data[start:self.end]
+
+    def since(self, timestamp):
+        view = self.view()
+        return view[np.searchsorted(view[:, 0], timestamp):]
+
+    def clear(self):
+        self.start = 0
+        self.end = 0
+        self.generation += 1
+
+    def _append(self, bar):
+        if self.end == len(self.data):
+            count = self.end - self.start
+            self.data[:count] = self.data[self.start:self.end]
+            self.start = 0
+            self.end = count
+        self.data[self.end] = bar[:len(COLUMNS)]
+        self.end += 1
+        if self.end - self.start > self.size:
+            self.start += 1
+
+    def merge(self, bars):
+        # Повертає кількість нових свічок; остання (ще формується) оновлюється на місці
+        added = 0
+        for bar in bars:
+            last = self.last_timestamp
+            if last is None or bar[0] > last:
+                self._append(bar)
+                added += 1
+            elif bar[0] == last:
+                self.data[self.end - 1] = bar[:len(COLUMNS)]
+        return added
+
+
+def resample(bars, timeframe_ms):
+    # Векторне групування базових свічок у старший таймфрейм (кошики по UTC)
+    bars = np.asarray(bars, dtype=np.float64)
+    if len(bars) == 0:
+        return np.empty((0, len(COLUMNS)), dtype=np.float64)
+    buckets = bars[:, 0] - bars[:, 0] % timeframe_ms
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(bars)]))
+    out = np.empty((len(starts), len(COLUMNS)), dtype=np.float64)
+    out[:, 0] = buckets[starts]
+    out[:, 1] = bars[starts, 1]
+    out[:, 2] = np.maximum.reduceat(bars[:, 2], starts)
+    out[:, 3] = np.minimum.reduceat(bars[:, 3], starts)
+    out[:, 4] = bars[ends - 1, 4]
+    out[:, 5] = np.add.reduceat(bars[:, 5], starts)
+    return out
+
+
+class Resampler:
+    # Свічки старшого таймфрейму з базового потоку по одній свічці.
+    # Закриті базові свічки поточного кошика згорнуті в closed, остання базова
+    # (ще може оновлюватись на місці) тримається окремо в forming
+    def __init__(self, timeframe_ms, size):
+        self.timeframe_ms = timeframe_ms
+        self.buffer = CandleBuffer(size)
+        self.closed = None
+        self.forming = None
+
+    @property
+    def last_base_timestamp(self):
+        return None if self.forming is None else int(self.forming[0])
+
+    def _bucket(self, timestamp):
+        return timestamp - timestamp % self.timeframe_ms
+
+    def _fold(self, bar):
+        bucket = self._bucket(bar[0])
+        if self.closed is None or self.closed[0] != bucket:
+            self.closed = np.array([bucket, bar[1], bar[2], bar[3], bar[4], bar[5]], dtype=np.float64)
+        else:
+            self.closed[2] = max(self.closed[2], bar[2])
+            self.closed[3] = min(self.closed[3], bar[3])
+            self.closed[4] = bar[4]
+            self.closed[5] += bar[5]
+
+    def update(self, bar):
+        timestamp = bar[0]
+        if self.forming is not None:
+            if timestamp < self.forming[0]:
+                return
+            if timestamp > self.forming[0]:
+                self._fold(self.forming)
+        self.forming = np.array(bar[:len(COLUMNS)], dtype=np.float64)
+        bucket = self._bucket(timestamp)
+        closed = self.closed if self.closed is not None and self.closed[0] == bucket else None
+        if closed is None:
+            current = [bucket, bar[1], bar[2], bar[3], bar[4], bar[5]]
+        else:
+            current = [bucket, closed[1], max(closed[2], bar[2]), min(closed[3], bar[3]), bar[4], closed[5] + bar[5]]
+        self.buffer.merge([current])
+
+    def feed(self, bars):
+        for bar in bars:
+            self.update(bar)
+
+    def seed(self, bars):
+        # Історія одним векторним проходом, далі - інкрементально
+        bars = np.asarray(bars, dtype=np.float64)
+        if len(bars) == 0:
+            return
+        history = resample(bars[:-1], self.timeframe_ms)
+        self.buffer.merge(history)
+        self.closed = history[-1].copy() if len(history) else None
+        self.forming = None
+        self.update(bars[-1])
+
+
+def symbol_filename(symbol):
+    return symbol.replace('/', '_').replace(':', '-')
+
+
+def filename_symbol(name):
+    return name.replace('-', ':').replace('_', '/')
+
+
+class CandleArchive:
+    # Сховище закритих свічок: каталог на пару/таймфрейм, по файлу float64 на колонку.
+    # Файли тільки дописуються і читаються через memmap.
+    def __init__(self, root):
+        self.root = root
+        self.last_ts = {}
+        self.lock = threading.Lock()
+
+    def _dir(self, symbol, timeframe):
+        return os.path.join(self.root, timeframe, symbol_filename(symbol))
+
+    def symbols(self, timeframe):
+        path = os.path.join(self.root, timeframe)
+        if not os.path.isdir(path):
+            return []
+        return [filename_symbol(name) for name in sorted(os.listdir(path))]
+
+    def _columns(self, symbol, timeframe):
+        path = self._dir(symbol, timeframe)
+        columns = []
+        for name in COLUMNS:
+            file = os.path.join(path, name + ".f64")
+            if not os.path.exists(file) or os.path.getsize(file) == 0:
+                return None
+            columns.append(np.memmap(file, dtype=np.float64, mode="r"))
+        # Після збою колонки можуть мати різну довжину - беремо спільну частину
+        length = min(len(col) for col in columns)
+        return [col[:length] for col in columns]
+
+    def read(self, symbol, timeframe, limit=None):
+        columns = self._columns(symbol, timeframe)
+        if columns is None:
+            return np.empty((0, len(COLUMNS)), dtype=np.float64)
+        if limit is not None:
+            columns = [col[-limit:] for col in columns]
+        return np.column_stack(columns)
+
+    def last_timestamp(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self.last_ts:
+            columns = self._columns(symbol, timeframe)
+            self.last_ts[key] = int(columns[0][-1]) if columns is not None and len(columns[0]) else None
+        return self.last_ts[key]
+
+    def _align(self, symbol, timeframe):
+        # Після обірваного запису колонки різної довжини: обрізаємо всі до спільної,
+        # інакше нові рядки дописались би зі зсувом між колонками
+        path = self._dir(symbol, timeframe)
+        files = [os.path.join(path, name + ".f64") for name in COLUMNS]
+        sizes = [os.path.getsize(f) if os.path.exists(f) else 0 for f in files]
+        length = min(sizes) // 8
+        if all(size == length * 8 for size in sizes):
+            return
+        for file, size in zip(files, sizes):
+            if size != length * 8:
+                os.truncate(file, length * 8)
+        self.last_ts.pop((symbol, timeframe), None)
+
+    def append(self, symbol, timeframe, bars):
+        bars = np.asarray(bars, dtype=np.float64)
+        if len(bars) == 0:
+            return 0
+        with self.lock:
+            self._align(symbol, timeframe)
+            last = self.last_timestamp(symbol, timeframe)
+            if last is not None:
+                bars = bars[bars[:, 0] > last]
+            if len(bars) == 0:
+                return 0
+            path = self._dir(symbol, timeframe)
+            os.makedirs(path, exist_ok=True)
+            for i, name in enumerate(COLUMNS):
+                with open(os.path.join(path, name + ".f64"), "ab") as f:
+                    f.write(np.ascontiguousarray(bars[:, i]).tobytes())
+            self.last_ts[(symbol, timeframe)] = int(bars[-1, 0])
+            return len(bars)
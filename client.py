@@ -0,0 +1,195 @@
+import random
+import threading
+import time
+
+import ccxt
+
+from clock import now
+import metrics
+
+# Групи ендпоінтів Bybit v5: у кожної свій ліміт (публічні - на IP, приватні - на UID)
+GROUPS = {
+    "fetch_ohlcv": "market",
+    "fetch_ticker": "market",
+    "fetch_tickers": "market",
+    "load_markets": "market",
+    "fetch_balance": "account",
+    "fetch_positions": "position",
+    "fetch_my_trades": "position",
+    "create_order": "order",
+    "create_market_order": "order",
+    "set_leverage": "order",
+    "private_post_v5_position_trading_stop": "order",
+}
+# Запити, що змінюють стан, повторюються лише коли біржа точно їх відхилила:
+# після таймауту ордер міг виконатись, і повтор відкрив би другу позицію
+WRITES = {name for name, group in GROUPS.items() if group == "order"}
+REJECTED = (ccxt.RateLimitExceeded, ccxt.DDoSProtection, ccxt.InvalidNonce)
+# Заголовки останньої відповіді в цьому потоці: last_response_headers у ccxt спільний
+# для клієнта, і паралельний запит іншої групи підмінив би залишок ліміту
+_response = threading.local()
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    # Експоненційна затримка з повним джитером: повтори з потоків не збігаються в часі
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _header(headers, name):
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _capture_headers(client):
+    hook = getattr(client, "on_rest_response", None)
+    if hook is None or getattr(hook, "captures_headers", False):
+        return
+
+    def on_rest_response(code, reason, url, method, response_headers, *args):
+        _response.headers = response_headers
+        return hook(code, reason, url, method, response_headers, *args)
+
+    on_rest_response.captures_headers = True
+    client.on_rest_response = on_rest_response
+
+
+class RateLimiter:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        while True:
+            with self.lock:
+                current = time.monotonic()
+                if current < self.paused_until:
+                    wait = self.paused_until - current
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (current - self.updated) * self.rate)
+                    self.updated = current
+                    if self.tokens >= cost:
+                        self.tokens -= cost
+                        return
+                    wait = (cost - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+    def sync(self, remaining, reset_ms=None):
+        # Біржа знає залишок точніше: локальний бакет не може бути повнішим за нього
+        with self.lock:
+            self.tokens = min(self.tokens, remaining)
+        if remaining < 1 and reset_ms:
+            self.pause(max(0.0, reset_ms / 1000 - time.time()))
+
+
+class CircuitBreaker:
+    # Після threshold невдалих запитів поспіль скан призупиняється на cooldown секунд.
+    # Перший запит після паузи - пробний: новий збій подвоює паузу (до max_cooldown).
+    # Ордери запобіжник не перевіряють
+    def __init__(self, threshold, cooldown, max_cooldown=600):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.pause = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.pause - time.monotonic())
+
+    def allow(self):
+        return not self.threshold or self.remaining() == 0
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            if self.opened_at is not None:
+                self.opened_at = None
+                self.pause = self.cooldown
+                print(f"{now()} ✅ API відновилось, скан продовжується")
+
+    def record_failure(self):
+        if not self.threshold:
+            return
+        with self.lock:
+            self.failures += 1
+            if self.failures < self.threshold or self.remaining() > 0:
+                return
+            if self.opened_at is not None:
+                self.pause = min(self.max_cooldown, self.pause * 2)
+            self.opened_at = time.monotonic()
+            print(f"{now()} 🔌 API нестабільне ({self.failures} збоїв поспіль), скан призупинено на {self.pause:.0f}с")
+
+
+class ResilientExchange:
+    # Обгортка клієнта ccxt: token bucket на групу ендпоінтів, ліміти із заголовків
+    # X-Bapi-Limit-*, повтори тимчасових помилок з джитером і облік збоїв у запобіжнику.
+    # Решта атрибутів (markets, parse_timeframe, market...) - напряму з клієнта
+    def __init__(self, client, limiters, breaker=None, retries=3):
+        self.client = client
+        self.limiters = limiters
+        self.breaker = breaker
+        self.retries = retries
+        _capture_headers(client)
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        group = GROUPS.get(name)
+        if group is None or not callable(attr):
+            return attr
+        return lambda *args, **kwargs: self.call(name, group, attr, *args, **kwargs)
+
+    def call(self, name, group, method, *args, **kwargs):
+        limiter = self.limiters.get(group)
+        transient = REJECTED if name in WRITES else ccxt.NetworkError
+        attempt = 0
+        while True:
+            if limiter is not None:
+                with metrics.span("rate_limit_wait"):
+                    limiter.acquire()
+            _response.headers = None
+            try:
+                result = method(*args, **kwargs)
+            except transient as e:
+                delay = backoff_delay(attempt)
+                if isinstance(e, (ccxt.RateLimitExceeded, ccxt.DDoSProtection)) and limiter is not None:
+                    limiter.pause(delay)
+                if attempt >= self.retries:
+                    if self.breaker is not None:
+                        self.breaker.record_failure()
+                    raise
+                attempt += 1
+                metrics.observe(f"retry_{group}", delay)
+                time.sleep(delay)
+                continue
+            self._sync(limiter)
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+    def _sync(self, limiter):
+        if limiter is None:
+            return
+        headers = _response.headers
+        remaining = _header(headers, "x-bapi-limit-status")
+        if remaining is None:
+            return
+        try:
+            reset = _header(headers, "x-bapi-limit-reset-timestamp")
+            limiter.sync(float(remaining), float(reset) if reset else None)
+        except ValueError:
+            pass
@@ -0,0 +1,6 @@
+from datetime import datetime
+
+
+def now():
+    # Час для логів: UTC, як у повідомленнях Telegram
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,199 @@
+import numpy as np
+
+NAN = float("nan")
+
+
+class EWM:
+    # Повторює арифметику pandas ewm().mean(), щоб значення збігалися з ta біт-у-біт
+    def __init__(self, span=None, alpha=None, min_periods=0, adjust=False):
+        com = (span - 1) / 2.0 if span is not None else (1 - alpha) / alpha
+        alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - alpha
+        self.new_wt = 1.0 if adjust else alpha
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.count = 0
+
+    def state(self):
+        return (self.weighted, self.old_wt, self.count)
+
+    def restore(self, state):
+        self.weighted, self.old_wt, self.count = state
+
+    @property
+    def value(self):
+        return self.weighted if self.count >= self.min_periods else NAN
+
+    def update(self, x):
+        self.count += 1
+        if self.count == 1:
+            self.weighted = x
+            self.old_wt = 1.0
+            return self.value
+        self.old_wt *= self.old_wt_factor
+        if self.weighted != x:
+            self.weighted = (self.old_wt * self.weighted + self.new_wt * x) / (self.old_wt + self.new_wt)
+        if self.adjust:
+            self.old_wt += self.new_wt
+        else:
+            self.old_wt = 1.0
+        return self.value
+
+
+class RSI:
+    def __init__(self, window):
+        self.up = EWM(alpha=1 / window, min_periods=window)
+        self.down = EWM(alpha=1 / window, min_periods=window)
+        self.prev_close = None
+
+    def state(self):
+        return (self.up.state(), self.down.state(), self.prev_close)
+
+    def restore(self, state):
+        up, down, self.prev_close = state
+        self.up.restore(up)
+        self.down.restore(down)
+
+    def update(self, close):
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        up = self.up.update(diff if diff > 0 else 0.0)
+        down = self.down.update(-diff if diff < 0 else 0.0)
+        if down == 0:
+            return 100.0
+        return 100 - (100 / (1 + up / down))
+
+
+class ATR:
+    # Як ta.volatility.AverageTrueRange: 0 до прогріву, далі згладжування Уайлдера
+    def __init__(self, window):
+        self.window = window
+        self.prev_close = None
+        self.seed = []
+        self.atr = 0.0
+        self.count = 0
+
+    def state(self):
+        return (self.prev_close, len(self.seed), self.atr, self.count)
+
+    def restore(self, state):
+        self.prev_close, seed_len, self.atr, self.count = state
+        del self.seed[seed_len:]
+
+    def update(self, high, low, close):
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.count += 1
+        if self.count < self.window:
+            self.seed.append(tr)
+        elif self.count == self.window:
+            self.seed.append(tr)
+            self.atr = np.array(self.seed).sum() / self.window
+        else:
+            self.atr = (self.atr * (self.window - 1) + tr) / float(self.window)
+        return self.atr
+
+
+class IndicatorState:
+    def __init__(self, rsi_window, atr_window):
+        self.ema9 = EWM(span=9, min_periods=9)
+        self.ema21 = EWM(span=21, min_periods=21)
+        self.ema200 = EWM(span=200, min_periods=200)
+        self.rsi = RSI(rsi_window)
+        self.atr = ATR(atr_window)
+        self.volume_ema = EWM(span=20, adjust=True)
+        self.count = 0
+        self.last_timestamp = None
+        self.last = None
+        self.prev = None
+        self._saved = None
+
+    def _state(self):
+        return (
+            self.ema9.state(), self.ema21.state(), self.ema200.state(),
+            self.rsi.state(), self.atr.state(), self.volume_ema.state(),
+            self.count, self.last_timestamp, self.last, self.prev,
+        )
+
+    def _restore(self, state):
+        (ema9, ema21, ema200, rsi, atr, volume_ema,
+         self.count, self.last_timestamp, self.last, self.prev) = state
+        self.ema9.restore(ema9)
+        self.ema21.restore(ema21)
+        self.ema200.restore(ema200)
+        self.rsi.restore(rsi)
+        self.atr.restore(atr)
+        self.volume_ema.restore(volume_ema)
+
+    def update(self, bar):
+        self._saved = self._state()
+        timestamp, open_, high, low, close, volume = bar[:6]
+        self.count += 1
+        self.last_timestamp = timestamp
+        self.prev = self.last
+        self.last = {
+            "timestamp": timestamp,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+            "EMA9": self.ema9.update(close),
+            "EMA21": self.ema21.update(close),
+            "EMA200": self.ema200.update(close),
+            "RSI": self.rsi.update(close),
+            "ATR": self.atr.update(high, low, close),
+            "volume_ema": self.volume_ema.update(volume),
+        }
+        return self.last
+
+    def revise_last(self, bar):
+        # Перерахунок свічки, що ще формується, від стану до її першого оновлення
+        if self._saved is None:
+            return self.update(bar)
+        saved = self._saved
+        self._restore(saved)
+        self.update(bar)
+        self._saved = saved
+        return self.last
+
+    def feed(self, bars):
+        for bar in bars:
+            timestamp = bar[0]
+            if self.last_timestamp is None or timestamp > self.last_timestamp:
+                self.update(bar)
+            elif timestamp == self.last_timestamp:
+                self.revise_last(bar)
+        return self.last
+
+
+def indicator_arrays(high, low, close, volume, rsi_window, atr_window):
+    # Векторний розрахунок тих самих індикаторів для всієї історії (бектест, оптимізатор).
+    # pandas імпортується тут: боту для потокових індикаторів він не потрібен
+    import pandas as pd
+    close_s = pd.Series(close, dtype=np.float64)
+    diff = close_s.diff(1)
+    up = diff.where(diff > 0, 0.0).ewm(alpha=1 / rsi_window, min_periods=rsi_window, adjust=False).mean()
+    down = (-diff.where(diff < 0, 0.0)).ewm(alpha=1 / rsi_window, min_periods=rsi_window, adjust=False).mean()
+    rsi = np.where(down == 0, 100, 100 - (100 / (1 + up / down)))
+
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = np.zeros(len(close))
+    if len(close) >= atr_window:
+        seeded = tr[atr_window - 1:].copy()
+        seeded[0] = tr[:atr_window].sum() / atr_window
+        atr[atr_window - 1:] = pd.Series(seeded).ewm(alpha=1 / atr_window, adjust=False).mean().to_numpy()
+
+    return {
+        "EMA9": close_s.ewm(span=9, min_periods=9, adjust=False).mean().to_numpy(),
+        "EMA21": close_s.ewm(span=21, min_periods=21, adjust=False).mean().to_numpy(),
+        "EMA200": close_s.ewm(span=200, min_periods=200, adjust=False).mean().to_numpy(),
+        "RSI": rsi,
+        "ATR": atr,
+        "volume_ema": pd.Series(volume, dtype=np.float64).ewm(span=20).mean().to_numpy(),
+    }
@@ -0,0 +1,206 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+from backtest import summarize
+from clock import now
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    account TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    side TEXT,
+    qty REAL,
+    price REAL,
+    order_id TEXT,
+    reason TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_account_kind ON orders (account, kind, symbol);
+CREATE TABLE IF NOT EXISTS executions (
+    exec_id TEXT PRIMARY KEY,
+    account TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    qty REAL NOT NULL,
+    price REAL NOT NULL,
+    fee REAL NOT NULL,
+    exec_type TEXT,
+    stop_order_type TEXT,
+    order_id TEXT,
+    closed_size REAL
+);
+CREATE INDEX IF NOT EXISTS executions_account_ts ON executions (account, ts);
+"""
+
+ORDER_SQL = ("INSERT INTO orders (ts, account, symbol, kind, side, qty, price, order_id, reason, data) "
+             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+EXECUTION_SQL = ("INSERT OR IGNORE INTO executions (exec_id, account, ts, symbol, side, qty, price, fee, "
+                 "exec_type, stop_order_type, order_id, closed_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+EXIT_REASONS = {
+    "TakeProfit": "TP",
+    "PartialTakeProfit": "TP",
+    "StopLoss": "SL",
+    "PartialStopLoss": "SL",
+    "TrailingStop": "SL",
+}
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def trades_from_executions(rows):
+    # Угоди з виконань у порядку часу (one-way режим): позиція від нуля до нуля.
+    # rows: (ts, symbol, side, qty, price, fee, stop_order_type)
+    books = {}
+    trades = []
+    for ts, symbol, side, qty, price, fee, stop_order_type in rows:
+        book = books.setdefault(symbol, {"position": 0.0, "avg": 0.0, "trade": None})
+        signed = qty if side == "Buy" else -qty
+        position = book["position"]
+        remaining = signed
+        trade = book["trade"]
+        if position != 0 and (position > 0) != (signed > 0):
+            closed = min(abs(signed), abs(position))
+            direction = 1 if position > 0 else -1
+            trade["gross"] += (price - book["avg"]) * closed * direction
+            trade["fees"] += fee * closed / abs(signed)
+            fee -= fee * closed / abs(signed)
+            trade["exit_price"] = price
+            trade["exit_time"] = ts
+            if stop_order_type:
+                trade["reason"] = EXIT_REASONS.get(stop_order_type, stop_order_type)
+            position += direction * -closed
+            remaining = signed + direction * closed
+            if abs(position) <= 1e-12 * max(1.0, abs(book["position"])):
+                position = 0.0
+                trade["pnl"] = trade["gross"] - trade["fees"]
+                trades.append(trade)
+                book["trade"] = None
+        if remaining and abs(remaining) > 1e-12:
+            if position == 0:
+                book["avg"] = price
+                book["trade"] = {
+                    "symbol": symbol, "side": "LONG" if remaining > 0 else "SHORT",
+                    "entry_time": ts, "entry_price": price, "exit_time": None, "exit_price": None,
+                    "reason": "EXIT", "gross": 0.0, "fees": 0.0,
+                }
+            else:
+                book["avg"] = (book["avg"] * abs(position) + price * abs(remaining)) / (abs(position) + abs(remaining))
+            book["trade"]["fees"] += fee
+            position += remaining
+        book["position"] = position
+    return trades
+
+
+class TradeJournal:
+    # Журнал ордерів і виконань у SQLite (WAL). Запис пачками у фоновому потоці,
+    # торговий цикл лише кладе рядки в чергу
+    def __init__(self, path, batch_seconds=0.2, max_batch=500):
+        self.path = path
+        self.batch_seconds = batch_seconds
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        # Схема створюється тут: помилка шляху чи бази - виняток у конструкторі,
+        # а не мовчазне падіння фонового потоку
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+        self.thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record_order(self, account, symbol, kind, side=None, qty=None, price=None, order_id=None, reason=None, **data):
+        self.queue.put((ORDER_SQL, (
+            time.time(), account, symbol, kind, side, qty, price, order_id, reason,
+            json.dumps(data, default=str) if data else None,
+        )))
+
+    def record_execution(self, account, symbol, item):
+        # item - сире виконання Bybit v5 (WebSocket execution або info з fetch_my_trades)
+        exec_id = item.get("execId")
+        if not exec_id:
+            return
+        stop_order_type = item.get("stopOrderType")
+        if stop_order_type in ("", "UNKNOWN"):
+            stop_order_type = None
+        self.queue.put((EXECUTION_SQL, (
+            exec_id, account, int(_float(item.get("execTime"))), symbol, item.get("side"),
+            _float(item.get("execQty")), _float(item.get("execPrice")), _float(item.get("execFee")),
+            item.get("execType"), stop_order_type, item.get("orderId"),
+            _float(item.get("closedSize")),
+        )))
+
+    def flush(self, timeout=5.0):
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.time() + self.batch_seconds
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for sql, params in batch:
+                        conn.execute(sql, params)
+            except sqlite3.Error as e:
+                print(f"{now()} ❌ Помилка запису журналу угод: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def last_entries(self, account):
+        rows = self._query("SELECT symbol, MAX(ts) FROM orders WHERE account = ? AND kind = 'entry' GROUP BY symbol", (account,))
+        return dict(rows)
+
+    def last_execution_time(self, account):
+        rows = self._query("SELECT MAX(ts) FROM executions WHERE account = ?", (account,))
+        return rows[0][0]
+
+    def trades(self, account):
+        rows = self._query(
+            "SELECT ts, symbol, side, qty, price, fee, stop_order_type FROM executions "
+            "WHERE account = ? AND (exec_type IS NULL OR exec_type = 'Trade') ORDER BY ts, exec_id",
+            (account,),
+        )
+        return trades_from_executions(rows)
+
+    def stats(self, account):
+        trades = self.trades(account)
+        stats = summarize(trades)
+        pnl = [t["pnl"] for t in trades]
+        stats["biggest_win"] = max([p for p in pnl if p > 0], default=0.0)
+        stats["biggest_loss"] = min([p for p in pnl if p <= 0], default=0.0)
+        return stats
@@ -1,17 +1,39 @@
 import os
 import time
+# Відлік для "від запуску до першого скану" - до імпорту важких модулів
+STARTED_AT = time.time()
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import ccxt
-import pandas as pd
-import ta
-import requests
+import numpy as np
 from datetime import datetime
 from dotenv import load_dotenv
+from clock import now
+from candles import CandleArchive, CandleBuffer, Resampler, COLUMNS as CANDLE_COLUMNS
+from indicators import IndicatorState
+from accounts import Account, load_accounts
+from markets import MarketTable
+from screener import rank_symbols
+from scheduler import ScanScheduler
+import metrics
+from notifier import TelegramNotifier
+from journal import TradeJournal
+from client import RateLimiter, CircuitBreaker, ResilientExchange, backoff_delay
+from paper import PaperExchange
+from risk import RiskEngine
+import stream
+from stream import parse_kline
+from signals import F as SIGNAL_FEATURES, STRATEGY, adaptive_windows, stack_features, entry_masks, exit_mask, trend_mask, tp_sl_percent, entry_rule
 
 load_dotenv()
 
 API_KEY = os.getenv("API_KEY")
 API_SECRET = os.getenv("API_SECRET")
 TESTNET = os.getenv("TESTNET", "False").lower() == "true"
+PAPER_TRADING = os.getenv("PAPER_TRADING", "False").lower() == "true"
+PAPER_BALANCE_USDT = float(os.getenv("PAPER_BALANCE_USDT", "1000"))
+PAPER_FEE_PERCENT = float(os.getenv("PAPER_FEE_PERCENT", "0.055"))
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
@@ -22,82 +44,415 @@ TIMEFRAME = os.getenv("TIMEFRAME", "5m")
 MIN_PROFIT_PERCENT = float(os.getenv("MIN_PROFIT_PERCENT", "0.3"))
 MIN_BALANCE_USDT = float(os.getenv("MIN_BALANCE_USDT", "10.0"))
 COOLDOWN_SECONDS = int(os.getenv("COOLDOWN_SECONDS", "120"))
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "8"))
+OHLCV_RATE_LIMIT = float(os.getenv("OHLCV_RATE_LIMIT", "50"))
+ORDER_RATE_LIMIT = float(os.getenv("ORDER_RATE_LIMIT", "10"))
+ACCOUNT_RATE_LIMIT = float(os.getenv("ACCOUNT_RATE_LIMIT", "20"))
+EXCHANGE_RETRIES = int(os.getenv("EXCHANGE_RETRIES", "3"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+SIGNAL_BATCH_SIZE = int(os.getenv("SIGNAL_BATCH_SIZE", "50"))
+USE_WEBSOCKET = os.getenv("USE_WEBSOCKET", "True").lower() == "true"
+STREAM_SYMBOLS_PER_CONNECTION = int(os.getenv("STREAM_SYMBOLS_PER_CONNECTION", "100"))
+STREAM_RECORD_PATH = os.getenv("STREAM_RECORD_PATH")
+STREAM_REPLAY_PATH = os.getenv("STREAM_REPLAY_PATH")
+TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", "100"))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_REPORT_SECONDS = int(os.getenv("METRICS_REPORT_SECONDS", "600"))
+CANDLE_ARCHIVE_DIR = os.getenv("CANDLE_ARCHIVE_DIR", "candles")
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "journal.db")
+STREAM_STALE_SECONDS = 30
+TICKER_MAX_AGE = 5
+POSITION_SYNC_SECONDS = int(os.getenv("POSITION_SYNC_SECONDS", "60"))
+EXIT_MONITOR_SECONDS = float(os.getenv("EXIT_MONITOR_SECONDS", "5"))
+EXIT_RATE_LIMIT = float(os.getenv("EXIT_RATE_LIMIT", "10"))
+EXIT_WORKERS = 4
+MARKETS_CACHE_PATH = os.getenv("MARKETS_CACHE_PATH", "markets.json")
+MARKETS_REFRESH_SECONDS = int(os.getenv("MARKETS_REFRESH_SECONDS", "3600"))
+UNIVERSE_TOP_N = int(os.getenv("UNIVERSE_TOP_N", "100"))
+UNIVERSE_MIN_TURNOVER = float(os.getenv("UNIVERSE_MIN_TURNOVER", "1000000"))
+UNIVERSE_MAX_SPREAD_PERCENT = float(os.getenv("UNIVERSE_MAX_SPREAD_PERCENT", "0.2"))
+UNIVERSE_REFRESH_SECONDS = int(os.getenv("UNIVERSE_REFRESH_SECONDS", "300"))
+SCAN_BUDGET = int(os.getenv("SCAN_BUDGET", "0"))
+SCAN_AGING_SECONDS = float(os.getenv("SCAN_AGING_SECONDS", "300"))
+ACCOUNTS_FILE = os.getenv("ACCOUNTS_FILE")
+RISK_WINDOW = int(os.getenv("RISK_WINDOW", "120"))
+RISK_MAX_CORRELATION = float(os.getenv("RISK_MAX_CORRELATION", "0.8"))
+RISK_BUDGET_POSITIONS = float(os.getenv("RISK_BUDGET_POSITIONS", "0"))
+RISK_MIN_SIZE = float(os.getenv("RISK_MIN_SIZE", "0.25"))
+HTF_CONFIRM_TIMEFRAME = os.getenv("HTF_CONFIRM_TIMEFRAME", "")
+HTF_TIMEFRAMES = [tf for tf in os.getenv("HTF_TIMEFRAMES", "").split(",") if tf]
 
-if TIMEFRAME == "1m":
-    ATR_WINDOW = 7
-    RSI_WINDOW = 3
-    HISTORY_LIMIT = 150
-elif TIMEFRAME == "3m":
-    ATR_WINDOW = 10
-    RSI_WINDOW = 4
-    HISTORY_LIMIT = 200
-else:
-    ATR_WINDOW = 14
-    RSI_WINDOW = 5
-    HISTORY_LIMIT = 250
-
-pnl_stats = {
-    "total_trades": 0,
-    "winning_trades": 0,
-    "losing_trades": 0,
-    "total_pnl": 0.0,
-    "biggest_win": 0.0,
-    "biggest_loss": 0.0
-}
+ATR_WINDOW, RSI_WINDOW, HISTORY_LIMIT = adaptive_windows(TIMEFRAME)
+
+candle_store = {}
+candle_archive = CandleArchive(CANDLE_ARCHIVE_DIR) if CANDLE_ARCHIVE_DIR else None
+indicator_states = {}
+htf_states = {}
+ticker_cache = {}
+stream_symbols = {}
+stream_events = queue.Queue()
+streams = []
+notifier = None
+journal = None
+# Монітор виходів і основний цикл не відкривають/закривають позиції одночасно
+trade_lock = threading.RLock()
+scan_scheduler = ScanScheduler(SCAN_AGING_SECONDS)
+market_table = MarketTable.load(MARKETS_CACHE_PATH) if MARKETS_CACHE_PATH else MarketTable()
+
+# Bybit v5: публічні market-ендпоінти обмежені 600 запитами / 5с на IP.
+# Скан тримається нижче цього бюджету, щоб ордери не впиралися в ліміт.
+ohlcv_limiter = RateLimiter(OHLCV_RATE_LIMIT, burst=max(1, SCAN_WORKERS))
+# Спільний для всіх клієнтів: збої будь-якого запиту призупиняють лише скан
+scan_breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN_SECONDS)
+scan_executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scan")
+# Монітор виходів має власні потоки й бюджет запитів: не стоїть у черзі за сканом ринку
+exit_limiter = RateLimiter(EXIT_RATE_LIMIT, burst=EXIT_WORKERS)
+exit_executor = ThreadPoolExecutor(max_workers=EXIT_WORKERS, thread_name_prefix="exit")
+
+# Бот торгує лише лінійними контрактами: spot/inverse/option не завантажуються
+MARKET_OPTIONS = {"fetchMarkets": {"types": ["linear"]}}
+
+def make_exchange(api_key, api_secret):
+    if PAPER_TRADING:
+        return PaperExchange(lambda symbol: get_last_price(symbol), PAPER_BALANCE_USDT, PAPER_FEE_PERCENT)
+    client = ccxt.bybit({
+        "apiKey": api_key,
+        "secret": api_secret,
+        "enableRateLimit": True,
+        "options": MARKET_OPTIONS,
+    })
+    if TESTNET:
+        client.set_sandbox_mode(True)
+    # Приватні ліміти Bybit рахуються на UID, тому бакети свої для кожного рахунку
+    limiters = {
+        "market": ohlcv_limiter,
+        "order": RateLimiter(ORDER_RATE_LIMIT),
+        "position": RateLimiter(ACCOUNT_RATE_LIMIT),
+        "account": RateLimiter(ACCOUNT_RATE_LIMIT),
+    }
+    return ResilientExchange(client, limiters, scan_breaker, EXCHANGE_RETRIES)
+
+market_data = ResilientExchange(ccxt.bybit({
+    "enableRateLimit": False,
+    "options": MARKET_OPTIONS,
+}), {"market": ohlcv_limiter}, scan_breaker, EXCHANGE_RETRIES)
+# Той самий клієнт (і ринки), але свій бакет запитів
+exit_data = ResilientExchange(market_data.client, {"market": exit_limiter}, scan_breaker, EXCHANGE_RETRIES)
 
-last_entry_time = {}
+TIMEFRAME_MS = market_data.parse_timeframe(TIMEFRAME) * 1000
+risk_engine = RiskEngine(TIMEFRAME_MS, RISK_WINDOW, RISK_MAX_CORRELATION, RISK_MIN_SIZE) if RISK_WINDOW else None
 
-exchange = ccxt.bybit({
-    "apiKey": API_KEY,
-    "secret": API_SECRET,
-    "enableRateLimit": True,
-})
+# Старші таймфрейми будуються з базових свічок, тому мають бути їх кратними
+if HTF_CONFIRM_TIMEFRAME and HTF_CONFIRM_TIMEFRAME not in HTF_TIMEFRAMES:
+    HTF_TIMEFRAMES.append(HTF_CONFIRM_TIMEFRAME)
+for _tf in list(HTF_TIMEFRAMES):
+    _tf_ms = market_data.parse_timeframe(_tf) * 1000
+    if _tf_ms <= TIMEFRAME_MS or _tf_ms % TIMEFRAME_MS:
+        print(f"⚠️ Таймфрейм {_tf} не кратний {TIMEFRAME}, пропускаю")
+        HTF_TIMEFRAMES.remove(_tf)
+if HTF_CONFIRM_TIMEFRAME not in HTF_TIMEFRAMES:
+    HTF_CONFIRM_TIMEFRAME = ""
 
 if TESTNET:
-    exchange.set_sandbox_mode(True)
+    market_data.set_sandbox_mode(True)
     print("🔸 TESTNET режим увімкнено")
+elif PAPER_TRADING:
+    print("📝 PAPER режим - симуляція ордерів на живих даних")
 else:
     print("🔴 LIVE режим - реальна торгівля!")
 
+ACCOUNT_DEFAULTS = {
+    "order_size": ORDER_SIZE_USDT,
+    "leverage": LEVERAGE,
+    "max_positions": MAX_POSITIONS,
+    "min_profit_percent": MIN_PROFIT_PERCENT,
+    "cooldown": COOLDOWN_SECONDS,
+}
+
+# Без ACCOUNTS_FILE - один рахунок з ключами та налаштуваннями з .env
+if ACCOUNTS_FILE:
+    accounts = load_accounts(ACCOUNTS_FILE, ACCOUNT_DEFAULTS, make_exchange)
+else:
+    accounts = [Account("main", make_exchange(API_KEY, API_SECRET), api_key=API_KEY, api_secret=API_SECRET, **ACCOUNT_DEFAULTS)]
+
+@metrics.timed("telegram")
 def send_telegram(message):
+    global notifier
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         return
     try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        data = {
-            "chat_id": TELEGRAM_CHAT_ID,
-            "text": message,
-            "parse_mode": "HTML"
-        }
-        requests.post(url, data=data, timeout=10)
+        if notifier is None:
+            notifier = TelegramNotifier(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, max_queue=TELEGRAM_QUEUE_SIZE)
+        notifier.send(message)
     except Exception as e:
         print(f"{now()} ⚠️ Помилка відправки Telegram: {e}")
 
-def get_balance():
+def get_balance(account):
+    # None - баланс невідомий (помилка API), а не нульовий
     try:
-        balance = exchange.fetch_balance()
+        balance = account.exchange.fetch_balance()
         usdt_balance = balance['USDT']['free'] if 'USDT' in balance else 0
         return float(usdt_balance)
     except Exception as e:
-        print(f"{now()} ❌ Помилка отримання балансу: {e}")
-        return 0
+        print(f"{now()} ❌ {account.tag}Помилка отримання балансу: {e}")
+        return None
 
-def now():
-    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+def refresh_candles(symbol, force=False, client=None):
+    client = client or market_data
+    buffer = candle_store.get(symbol)
+    if buffer is None:
+        buffer = candle_store.setdefault(symbol, CandleBuffer(HISTORY_LIMIT))
+    with buffer.lock:
+        if len(buffer) == 0 and candle_archive is not None:
+            buffer.merge(candle_archive.read(symbol, TIMEFRAME, HISTORY_LIMIT))
+        last_ts = buffer.last_timestamp
+        missing = None
+        if last_ts is not None:
+            missing = int((time.time() * 1000 - last_ts) // TIMEFRAME_MS) + 1
+            if not force and missing == 1 and time.time() - buffer.streamed_at < STREAM_STALE_SECONDS:
+                return buffer
+        with metrics.span("rest_ohlcv"):
+            if missing is None or missing >= HISTORY_LIMIT:
+                bars = client.fetch_ohlcv(symbol, timeframe=TIMEFRAME, limit=HISTORY_LIMIT)
+                buffer.clear()
+            else:
+                bars = client.fetch_ohlcv(symbol, timeframe=TIMEFRAME, since=last_ts, limit=missing + 1)
+        buffer.merge(bars)
+        archive_closed_candles(symbol, buffer)
+    return buffer
 
+def archive_closed_candles(symbol, buffer):
+    if candle_archive is None:
+        return
+    try:
+        bars = buffer.view()
+        candle_archive.append(symbol, TIMEFRAME, bars[bars[:, 0] + TIMEFRAME_MS <= time.time() * 1000])
+    except Exception as e:
+        print(f"{now()} ⚠️ Помилка запису свічок {symbol} в архів: {e}")
+
+@metrics.timed("fetch_ohlcv")
 def fetch_ohlcv(symbol, limit=None):
+    import pandas as pd
     try:
-        if limit is None:
-            limit = HISTORY_LIMIT
-        bars = exchange.fetch_ohlcv(symbol, timeframe=TIMEFRAME, limit=limit)
-        df = pd.DataFrame(bars, columns=["timestamp", "open", "high", "low", "close", "volume"])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        buffer = refresh_candles(symbol)
+        with buffer.lock, metrics.span("dataframe"):
+            df = pd.DataFrame(buffer.view(limit).copy(), columns=CANDLE_COLUMNS)
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         return df
     except Exception as e:
         print(f"{now()} ❌ Помилка отримання OHLCV для {symbol}: {e}")
         return None
 
+def update_indicator_state(symbol, buffer):
+    generation, state = indicator_states.get(symbol, (None, None))
+    if state is None or generation != buffer.generation:
+        state = IndicatorState(RSI_WINDOW, ATR_WINDOW)
+        indicator_states[symbol] = (buffer.generation, state)
+        state.feed(buffer.view())
+    else:
+        state.feed(buffer.since(state.last_timestamp))
+    if risk_engine is not None and state.last is not None:
+        risk_engine.update(symbol, buffer.view(), state.last["ATR"])
+    for timeframe in HTF_TIMEFRAMES:
+        update_htf_state(symbol, timeframe, buffer)
+    return state.last, state.prev, state.count
+
+def update_htf_state(symbol, timeframe, buffer):
+    # Старший таймфрейм з того ж базового буфера: жодних додаткових запитів до біржі
+    generation, resampler, state = htf_states.get((symbol, timeframe), (None, None, None))
+    if resampler is None or generation != buffer.generation:
+        timeframe_ms = market_data.parse_timeframe(timeframe) * 1000
+        atr_window, rsi_window, history = adaptive_windows(timeframe)
+        bars = buffer.view()
+        if candle_archive is not None:
+            # Історію для прогріву беремо з архіву закритих базових свічок
+            archived = candle_archive.read(symbol, TIMEFRAME, history * (timeframe_ms // TIMEFRAME_MS))
+            if len(archived) and len(bars):
+                bars = np.concatenate((archived[archived[:, 0] < bars[0, 0]], bars))
+            elif len(archived):
+                bars = archived
+        if not len(bars) or (bars[-1, 0] - bars[0, 0]) // timeframe_ms + 1 < history:
+            bars = backfill_htf(symbol, timeframe, timeframe_ms, history, bars)
+        resampler = Resampler(timeframe_ms, history)
+        resampler.seed(bars)
+        state = IndicatorState(rsi_window, atr_window)
+        state.feed(resampler.buffer.view())
+        htf_states[(symbol, timeframe)] = (buffer.generation, resampler, state)
+        return state
+    last_base = resampler.last_base_timestamp
+    resampler.feed(buffer.view() if last_base is None else buffer.since(last_base))
+    state.feed(resampler.buffer.since(state.last_timestamp))
+    return state
+
+def backfill_htf(symbol, timeframe, timeframe_ms, history, bars):
+    # Холодний архів: базових свічок замало для прогріву EMA старшого таймфрейму,
+    # тож закриті свічки до початку базової історії беремо з біржі одним запитом
+    try:
+        htf_bars = np.asarray(market_data.fetch_ohlcv(symbol, timeframe=timeframe, limit=history), dtype=np.float64)
+    except Exception as e:
+        print(f"{now()} ⚠️ Не вдалося завантажити історію {timeframe} для {symbol}: {e}")
+        return bars
+    if not len(htf_bars):
+        return bars
+    if not len(bars):
+        return htf_bars
+    # Неповний перший кошик базових свічок замінюється свічкою з біржі
+    cut = bars[0, 0] - bars[0, 0] % timeframe_ms
+    if cut != bars[0, 0] and bars[-1, 0] - bars[-1, 0] % timeframe_ms > cut:
+        cut += timeframe_ms
+    return np.concatenate((htf_bars[htf_bars[:, 0] < cut].reshape(-1, bars.shape[1]), bars[bars[:, 0] >= cut]))
+
+def htf_snapshot(symbol, timeframe):
+    entry = htf_states.get((symbol, timeframe))
+    if entry is None or entry[2].last is None:
+        return None
+    state = entry[2]
+    return state.last, state.prev, state.count
+
+def confirm_higher_timeframe(found):
+    # Залишає сигнали, тренд яких підтверджує HTF_CONFIRM_TIMEFRAME
+    if not HTF_CONFIRM_TIMEFRAME or not found:
+        return found
+    rows = []
+    kept = []
+    unconfirmed = []
+    for item in found:
+        snapshot = htf_snapshot(item[0], HTF_CONFIRM_TIMEFRAME)
+        if snapshot is None or np.isnan(snapshot[0]["EMA21"]):
+            # Старший таймфрейм ще не прогрітий: сигнал проходить без підтвердження
+            print(f"{now()} ⚠️ {item[0]}: {HTF_CONFIRM_TIMEFRAME} ще без історії, вхід без підтвердження тренду")
+            unconfirmed.append(item)
+            continue
+        rows.append(snapshot[:2])
+        kept.append(item)
+    if not kept:
+        return unconfirmed
+    mask = trend_mask(stack_features(rows), np.array([sig == "LONG" for _, sig, _ in kept]))
+    return unconfirmed + [item for item, ok in zip(kept, mask) if ok]
+
+@metrics.timed("fetch_indicators")
+def fetch_indicators(symbol, force=False, client=None):
+    try:
+        buffer = refresh_candles(symbol, force, client)
+        with buffer.lock, metrics.span("indicators_update"):
+            return update_indicator_state(symbol, buffer)
+    except Exception as e:
+        print(f"{now()} ❌ Помилка розрахунку індикаторів для {symbol}: {e}")
+        return None
+
+def scan_symbol(symbol):
+    # Запобіжник відкритий - решта скану пропускається без запитів до біржі
+    if not scan_breaker.allow():
+        return None
+    return fetch_indicators(symbol)
+
+def scan_market(symbols, throttled=True):
+    task = scan_symbol if throttled else fetch_indicators
+    futures = {scan_executor.submit(task, symbol): symbol for symbol in symbols}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+def apply_stream_klines(symbol, items):
+    buffer = candle_store.get(symbol)
+    if buffer is None or len(buffer) == 0:
+        return None
+    closed = None
+    with buffer.lock:
+        for item in items:
+            bar, confirm = parse_kline(item)
+            if bar[0] > buffer.last_timestamp + TIMEFRAME_MS:
+                return None
+            buffer.merge([bar])
+            buffer.streamed_at = time.time()
+            snapshot = update_indicator_state(symbol, buffer)
+            if confirm:
+                closed = snapshot
+                archive_closed_candles(symbol, buffer)
+    return closed
+
+def on_stream_message(message, account=None):
+    topic = message["topic"]
+    data = message.get("data")
+    if topic.startswith("kline."):
+        symbol = stream_symbols.get(topic.rsplit(".", 1)[1])
+        if symbol:
+            snapshot = apply_stream_klines(symbol, data)
+            if snapshot is not None:
+                stream_events.put(("candle_closed", symbol, snapshot))
+    elif topic.startswith("tickers."):
+        symbol = stream_symbols.get(data.get("symbol"))
+        if symbol and data.get("lastPrice"):
+            ticker_cache[symbol] = (float(data["lastPrice"]), time.time())
+    elif topic.startswith("position") and account is not None:
+        for item in data:
+            if item.get("category", "linear") == "linear":
+                account.position_book.apply_stream(stream_symbols.get(item.get("symbol"), item.get("symbol")), item)
+    elif topic.startswith("execution") and account is not None:
+        for item in data:
+            stream_events.put(("execution", stream_symbols.get(item.get("symbol"), item.get("symbol")), (account, item)))
+
+def backfill_candles(symbols):
+    for _ in scan_executor.map(lambda s: fetch_indicators(s, force=True), symbols):
+        pass
+
+def start_streams(symbols):
+    if not USE_WEBSOCKET:
+        return
+    if not stream.available():
+        print(f"{now()} ⚠️ websocket-client не встановлено, працюю через REST")
+        return
+    if TIMEFRAME not in stream.KLINE_INTERVALS:
+        print(f"{now()} ⚠️ Таймфрейм {TIMEFRAME} не підтримується WebSocket, працюю через REST")
+        return
+    
+    connect = None
+    if STREAM_REPLAY_PATH:
+        connect = lambda url: stream.ReplayConnection(STREAM_REPLAY_PATH)
+    
+    for symbol in symbols:
+        stream_symbols[market_data.market(symbol)['id']] = symbol
+    market_ids = [market_data.market(symbol)['id'] for symbol in symbols]
+    public_url = stream.PUBLIC_TESTNET_URL if TESTNET else stream.PUBLIC_URL
+    
+    for i in range(0, len(market_ids), STREAM_SYMBOLS_PER_CONNECTION):
+        chunk = market_ids[i:i + STREAM_SYMBOLS_PER_CONNECTION]
+        chunk_symbols = [stream_symbols[market_id] for market_id in chunk]
+        topics = stream.kline_topics(chunk, TIMEFRAME) + stream.ticker_topics(chunk)
+        streams.append(stream.BybitStream(
+            public_url, topics, on_stream_message,
+            on_reconnect=lambda chunk_symbols=chunk_symbols: backfill_candles(chunk_symbols),
+            connect=connect, record_path=STREAM_RECORD_PATH,
+            name=f"ws-public-{i // STREAM_SYMBOLS_PER_CONNECTION + 1}",
+        ).start())
+    
+    # Приватний потік на кожен рахунок: позиції та виконання йдуть у його книгу
+    private_url = stream.PRIVATE_TESTNET_URL if TESTNET else stream.PRIVATE_URL
+    for account in accounts:
+        if not account.api_key or not account.api_secret or STREAM_REPLAY_PATH or PAPER_TRADING:
+            continue
+        streams.append(stream.BybitStream(
+            private_url, ["position.linear", "execution.linear"],
+            lambda message, account=account: on_stream_message(message, account),
+            api_key=account.api_key, api_secret=account.api_secret, name=f"ws-private-{account.name}",
+        ).start())
+    
+    print(f"{now()} 🔌 WebSocket: {len(streams)} з'єднань, {len(market_ids)} пар")
+
+def get_last_price(symbol):
+    cached = ticker_cache.get(symbol)
+    if cached and time.time() - cached[1] < TICKER_MAX_AGE:
+        return cached[0]
+    return float(market_data.fetch_ticker(symbol)['last'])
+
+@metrics.timed("calculate_indicators")
 def calculate_indicators(df):
+    import ta
     try:
         df['EMA9'] = ta.trend.ema_indicator(df['close'], window=9)
         df['EMA21'] = ta.trend.ema_indicator(df['close'], window=21)
@@ -111,88 +466,114 @@ def calculate_indicators(df):
         print(f"{now()} ❌ Помилка розрахунку індикаторів: {e}")
         return None
 
-def get_open_positions():
+def sync_positions(account, force=False):
+    if not force and time.time() - account.position_book.synced_at < POSITION_SYNC_SECONDS:
+        return
     try:
-        positions = exchange.fetch_positions()
-        open_pos = []
-        for p in positions:
-            contracts = float(p.get('contracts', 0))
-            size = float(p.get('size', 0))
-            position_amt = float(p.get('positionAmt', 0))
-            
-            actual_size = contracts or size or position_amt
-            
-            if abs(actual_size) > 0:
-                open_pos.append(p)
-        return open_pos
+        account.position_book.sync(account.exchange.fetch_positions())
     except Exception as e:
-        print(f"{now()} ⚠️ Помилка отримання позицій: {e}")
-        return []
+        print(f"{now()} ⚠️ {account.tag}Помилка синхронізації позицій: {e}")
+    sync_executions(account)
 
-def calculate_amount(price):
-    return round((ORDER_SIZE_USDT * LEVERAGE) / price, 6)
+def calculate_amount(symbol, price, account, scale=1.0):
+    return market_table.amount_for(symbol, account.notional * scale, price)
 
-def get_tick_size(symbol):
-    try:
-        market = exchange.market(symbol)
-        if 'info' in market and 'priceFilter' in market['info']:
-            tick_size = float(market['info']['priceFilter'].get('tickSize', 0.01))
-            return tick_size
-        if 'precision' in market and 'price' in market['precision']:
-            decimals = market['precision']['price']
-            return 10 ** (-decimals)
-        return 0.01
-    except:
-        return 0.01
-
-def round_to_tick(price, tick_size, round_up=True):
-    if tick_size <= 0:
-        tick_size = 0.01
-    import math
-    if round_up:
-        return math.ceil(price / tick_size) * tick_size
-    else:
-        return math.floor(price / tick_size) * tick_size
+def position_notionals(account):
+    positions = [account.position_book.get(symbol) for symbol in account.position_book]
+    return [(p['symbol'], p['side'], p['contracts'] * p['entry_price']) for p in positions if p]
 
-def update_pnl_stats(pnl, trade_type="manual"):
-    global pnl_stats
-    pnl_stats["total_trades"] += 1
-    pnl_stats["total_pnl"] += pnl
-    
-    if pnl > 0:
-        pnl_stats["winning_trades"] += 1
-        if pnl > pnl_stats["biggest_win"]:
-            pnl_stats["biggest_win"] = pnl
-    else:
-        pnl_stats["losing_trades"] += 1
-        if pnl < pnl_stats["biggest_loss"]:
-            pnl_stats["biggest_loss"] = pnl
-    
-    winrate = (pnl_stats["winning_trades"] / pnl_stats["total_trades"] * 100) if pnl_stats["total_trades"] > 0 else 0
-    print(f"{now()} 📊 PnL: {pnl:+.2f} USDT | Total: {pnl_stats['total_pnl']:+.2f} USDT | Winrate: {winrate:.1f}% ({pnl_stats['winning_trades']}/{pnl_stats['total_trades']})")
+def risk_scale(account, symbol, side):
+    # Частка розміру за граничним ризиком портфеля рахунку (0 - вхід відхилено)
+    if risk_engine is None:
+        return 1.0
+    with metrics.span("risk_check"):
+        scale, reason = risk_engine.size_factor(
+            symbol, side, account.notional, position_notionals(account),
+            RISK_BUDGET_POSITIONS or account.max_positions,
+        )
+    if scale <= 0:
+        print(f"{now()} 🛡 {account.tag}{symbol}: вхід відхилено ({reason})")
+    elif reason:
+        print(f"{now()} ⚖️ {account.tag}{symbol}: {reason}")
+    return scale
+
+@metrics.timed("select_universe")
+def select_universe(symbols):
+    # Один масовий запит тікерів замість свічок для кожної пари
+    if not UNIVERSE_TOP_N:
+        return list(symbols)
+    tickers = market_data.fetch_tickers(None, {'type': 'swap', 'subType': 'linear'})
+    return rank_symbols(tickers, symbols, UNIVERSE_TOP_N, UNIVERSE_MIN_TURNOVER, UNIVERSE_MAX_SPREAD_PERCENT)
+
+def share_markets(markets):
+    market_data.set_markets(markets)
+    for account in accounts:
+        account.exchange.set_markets(markets)
 
-def print_pnl_stats():
-    if pnl_stats["total_trades"] == 0:
+def refresh_markets():
+    # Повне оновлення ринків: нові лістинги, зміни тіку/лоту, делістинги
+    markets = list(market_data.load_markets(reload=True).values())
+    market_table.update(markets)
+    share_markets(market_table.markets)
+    if MARKETS_CACHE_PATH:
+        try:
+            market_table.save(MARKETS_CACHE_PATH)
+        except OSError as e:
+            print(f"{now()} ⚠️ Не вдалося зберегти кеш ринків: {e}")
+    return market_table.symbols()
+
+def print_pnl_stats(account):
+    # Статистика з фактичних виконань у журналі, а не з оцінок під час закриття
+    if journal is None:
+        return
+    journal.flush()
+    stats = journal.stats(account.name)
+    if stats["total_trades"] == 0:
         return
-    winrate = pnl_stats["winning_trades"] / pnl_stats["total_trades"] * 100
     msg = (
         f"\n{'='*60}\n"
-        f"📊 PnL СТАТИСТИКА:\n"
+        f"📊 {account.tag}PnL СТАТИСТИКА:\n"
         f"{'='*60}\n"
-        f"Всього угод: {pnl_stats['total_trades']}\n"
-        f"Прибуткових: {pnl_stats['winning_trades']} | Збиткових: {pnl_stats['losing_trades']}\n"
-        f"Winrate: {winrate:.2f}%\n"
-        f"Загальний PnL: {pnl_stats['total_pnl']:+.2f} USDT\n"
-        f"Найбільший профіт: +{pnl_stats['biggest_win']:.2f} USDT\n"
-        f"Найбільший збиток: {pnl_stats['biggest_loss']:.2f} USDT\n"
+        f"Всього угод: {stats['total_trades']}\n"
+        f"Прибуткових: {stats['winning_trades']} | Збиткових: {stats['total_trades'] - stats['winning_trades']}\n"
+        f"Winrate: {stats['winrate']:.2f}%\n"
+        f"Загальний PnL: {stats['total_pnl']:+.2f} USDT (комісії: {stats['fees']:.2f} USDT)\n"
+        f"Найбільший профіт: +{stats['biggest_win']:.2f} USDT\n"
+        f"Найбільший збиток: {stats['biggest_loss']:.2f} USDT\n"
+        f"Макс. просадка: {stats['max_drawdown']:.2f} USDT\n"
         f"{'='*60}\n"
     )
     print(msg)
     send_telegram(msg.replace('=', '─'))
 
-def close_position(symbol, side, reason="manual", entry_price=None):
+def record_order(account, symbol, kind, **fields):
+    if journal is not None:
+        journal.record_order(account.name, symbol, kind, **fields)
+
+def sync_executions(account):
+    # Виконання через REST: добирає пропущене WebSocket (розриви, режим без WS)
+    if journal is None:
+        return
+    # Bybit віддає до 100 виконань на сторінку, від нових до старих: ccxt гортає
+    # сторінки курсором до since, інакше при сплеску угод старіші пропали б
+    since = account.executions_synced_at
+    try:
+        trades = account.exchange.fetch_my_trades(None, since, None, {'type': 'swap', 'subType': 'linear', 'paginate': True})
+    except Exception as e:
+        print(f"{now()} ⚠️ {account.tag}Помилка отримання виконань: {e}")
+        return
+    for trade in trades:
+        journal.record_execution(account.name, trade['symbol'], trade['info'])
+        account.executions_synced_at = max(account.executions_synced_at, int(trade['timestamp'] or 0))
+
+@metrics.timed("close_position")
+def close_position(account, symbol, side, reason="manual", entry_price=None):
     try:
-        positions = exchange.fetch_positions([symbol])
+        position = account.position_book.get(symbol)
+        if position is not None:
+            positions = [{'contracts': position['contracts']}]
+        else:
+            positions = account.exchange.fetch_positions([symbol])
         for pos in positions:
             contracts = float(pos.get('contracts', 0))
             size = float(pos.get('size', 0))
@@ -204,165 +585,154 @@ def close_position(symbol, side, reason="manual", entry_price=None):
                 amount = abs(actual_size)
                 close_side = 'sell' if side == "LONG" else 'buy'
                 
-                ticker = exchange.fetch_ticker(symbol)
-                exit_price = float(ticker['last'])
+                exit_price = get_last_price(symbol)
                 
                 if entry_price:
-                    if side == "LONG":
-                        pnl = (exit_price - entry_price) / entry_price * 100 * ORDER_SIZE_USDT * LEVERAGE
-                    else:
-                        pnl = (entry_price - exit_price) / entry_price * 100 * ORDER_SIZE_USDT * LEVERAGE
-                    update_pnl_stats(pnl)
+                    # Оцінка за ціною перед ордером; фактичний PnL рахується з виконань у журналі
+                    direction = 1 if side == "LONG" else -1
+                    pnl = (exit_price - entry_price) * amount * direction
                 
-                exchange.create_market_order(symbol, close_side, amount, {'reduceOnly': True})
-                print(f"{now()} 🔄 Позицію {symbol} закрито | Причина: {reason}")
-                send_telegram(f"🔄 Закрито {side} {symbol}\nПричина: {reason}\nPnL: {pnl:+.2f} USDT" if entry_price else f"🔄 Закрито {side} {symbol}")
+                order = account.exchange.create_market_order(symbol, close_side, amount, {'reduceOnly': True})
+                account.position_book.remove(symbol)
+                record_order(account, symbol, "exit", side=side, qty=amount, price=exit_price,
+                             order_id=(order or {}).get('id'), reason=reason)
+                print(f"{now()} 🔄 {account.tag}Позицію {symbol} закрито | Причина: {reason}")
+                send_telegram(f"🔄 {account.tag}Закрито {side} {symbol}\nПричина: {reason}\nPnL: ~{pnl:+.2f} USDT" if entry_price else f"🔄 {account.tag}Закрито {side} {symbol}")
                 return True
         return False
     except Exception as e:
-        print(f"{now()} ❌ Помилка закриття позиції {symbol}: {e}")
+        print(f"{now()} ❌ {account.tag}Помилка закриття позиції {symbol}: {e}")
+        account.position_book.invalidate()
         return False
 
-def exit_signal(df, side, symbol=""):
+def ensure_leverage(account, symbol):
+    # Плече встановлюється один раз на пару; далі Bybit його пам'ятає
+    if symbol in account.leverage_ready:
+        return
+    leverage = market_table.leverage_for(symbol, account.leverage)
+    if leverage < account.leverage:
+        print(f"{now()} ⚠️ {symbol}: максимальне плече {leverage}x, використовую його")
     try:
-        last = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        ema9 = last['EMA9']
-        ema21 = last['EMA21']
-        rsi = last['RSI']
-        
-        if pd.isna([ema9, ema21, rsi]).any():
-            return False
-        
-        if side == "LONG":
-            if ema9 < ema21:
-                print(f"{now()} 🔴 {symbol} EXIT: EMA9 перетнула EMA21 вниз (було LONG)")
-                return True
-            if rsi < 30:
-                print(f"{now()} 🔴 {symbol} EXIT: RSI перепроданість {rsi:.1f} (було LONG)")
-                return True
-        
-        elif side == "SHORT":
-            if ema9 > ema21:
-                print(f"{now()} 🟢 {symbol} EXIT: EMA9 перетнула EMA21 вгору (було SHORT)")
-                return True
-            if rsi > 70:
-                print(f"{now()} 🟢 {symbol} EXIT: RSI перекупленість {rsi:.1f} (було SHORT)")
-                return True
-        
-        return False
-    except Exception as e:
-        print(f"{now()} ❌ Помилка перевірки exit signal: {e}")
-        return False
+        account.exchange.set_leverage(leverage, symbol)
+    except ccxt.BadRequest as e:
+        # 110043: плече вже таке саме
+        if "110043" not in str(e):
+            raise
+    account.leverage_ready.add(symbol)
 
-def open_position(symbol, side, atr):
-    global last_entry_time
-    
+def place_entry_order(account, symbol, side, amount, tp_price, sl_price):
+    # Один запит v5 /order/create з TP/SL: позиція захищена з моменту виконання.
+    # Якщо біржа відхиляє такий формат, відкриваємо звичайний ордер, а TP/SL
+    # ставимо окремо (повертається False)
+    order_side = 'buy' if side == "LONG" else 'sell'
+    try:
+        order = account.exchange.create_order(symbol, 'market', order_side, amount, None, {
+            'takeProfit': tp_price,
+            'stopLoss': sl_price,
+            'tpTriggerBy': 'LastPrice',
+            'slTriggerBy': 'LastPrice',
+            'tpslMode': 'Full',
+        })
+        print(f"{now()} ✅ TP/SL встановлено разом з ордером для {symbol}")
+        return order, True
+    except (ccxt.InvalidOrder, ccxt.BadRequest) as e:
+        print(f"{now()} ⚠️ Ордер з TP/SL відхилено для {symbol} ({e}), відкриваю без них")
+    return account.exchange.create_market_order(symbol, order_side, amount), False
+
+def set_trading_stop(account, symbol, tp_price, sl_price, max_retries=3):
+    bybit_symbol = symbol.replace('/', '').replace(':USDT', '')
+    params = {
+        'category': 'linear',
+        'symbol': bybit_symbol,
+        'takeProfit': str(tp_price),
+        'stopLoss': str(sl_price),
+        'tpTriggerBy': 'LastPrice',
+        'slTriggerBy': 'LastPrice',
+        'positionIdx': 0
+    }
+    for attempt in range(max_retries):
+        try:
+            account.exchange.private_post_v5_position_trading_stop(params)
+            print(f"{now()} ✅ TP/SL встановлено для {symbol}")
+            return True
+        except Exception as e:
+            if attempt < max_retries - 1:
+                print(f"{now()} ⚠️ Спроба {attempt + 1} встановлення TP/SL не вдалася, повтор...")
+                time.sleep(1)
+            else:
+                print(f"{now()} ❌ КРИТИЧНА ПОМИЛКА: TP/SL не встановлено для {symbol} після {max_retries} спроб: {e}")
+    return False
+
+@metrics.timed("open_position")
+def open_position(account, symbol, side, atr):
     current_time = time.time()
-    if symbol in last_entry_time:
-        time_since_last = current_time - last_entry_time[symbol]
-        if time_since_last < COOLDOWN_SECONDS:
-            remaining = COOLDOWN_SECONDS - time_since_last
-            print(f"{now()} ⏳ {symbol} у cooldown, залишилось {remaining:.0f}с")
+    if symbol in account.last_entry_time:
+        time_since_last = current_time - account.last_entry_time[symbol]
+        if time_since_last < account.cooldown:
+            remaining = account.cooldown - time_since_last
+            print(f"{now()} ⏳ {account.tag}{symbol} у cooldown, залишилось {remaining:.0f}с")
             return False
     
     order_opened = False
     try:
-        market = exchange.market(symbol)
-        ticker = exchange.fetch_ticker(symbol)
-        price = float(ticker['last'])
-        amount = calculate_amount(price)
-        
-        tick_size = get_tick_size(symbol)
+        scale = risk_scale(account, symbol, side)
+        if scale <= 0:
+            return False
+        price = get_last_price(symbol)
+        amount = calculate_amount(symbol, price, account, scale)
+        if amount <= 0:
+            print(f"{now()} ⚠️ {account.tag}{symbol}: розмір {account.notional * scale:.2f} USDT менший за мінімальний ордер біржі")
+            return False
 
-        if pd.isna(atr) or atr <= 0:
+        if np.isnan(atr) or atr <= 0:
             print(f"{now()} ⚠️ ATR недійсний для {symbol}, використовую мінімальний профіт")
-            tp_percent = MIN_PROFIT_PERCENT
-            sl_percent = 0.3
-        else:
-            tp_percent_atr = atr / price * 100 * 3
-            sl_percent_atr = atr / price * 100 * 1.5
-            
-            if pd.isna(tp_percent_atr):
-                tp_percent = MIN_PROFIT_PERCENT
-            else:
-                tp_percent = max(MIN_PROFIT_PERCENT, tp_percent_atr)
-            
-            if pd.isna(sl_percent_atr):
-                sl_percent = 0.3
-            else:
-                sl_percent = max(0.3, sl_percent_atr)
+        tp_percent, sl_percent = tp_sl_percent(price, atr, account.min_profit_percent, account.strategy)
+        tp_percent, sl_percent = float(tp_percent), float(sl_percent)
 
         tp_price_raw = price * (1 + tp_percent/100) if side == "LONG" else price * (1 - tp_percent/100)
         sl_price_raw = price * (1 - sl_percent/100) if side == "LONG" else price * (1 + sl_percent/100)
         
-        if side == "LONG":
-            tp_price = round_to_tick(tp_price_raw, tick_size, round_up=True)
-            sl_price = round_to_tick(sl_price_raw, tick_size, round_up=False)
-        else:
-            tp_price = round_to_tick(tp_price_raw, tick_size, round_up=False)
-            sl_price = round_to_tick(sl_price_raw, tick_size, round_up=True)
+        tp_price = market_table.round_price(symbol, tp_price_raw, round_up=side == "LONG")
+        sl_price = market_table.round_price(symbol, sl_price_raw, round_up=side != "LONG")
 
-        exchange.set_leverage(LEVERAGE, symbol)
+        ensure_leverage(account, symbol)
         
-        order = exchange.create_market_order(
-            symbol, 
-            'buy' if side == "LONG" else 'sell', 
-            amount
-        )
+        order_started = time.perf_counter()
+        order, tp_sl_attached = place_entry_order(account, symbol, side, amount, tp_price, sl_price)
         order_opened = True
+        account.position_book.add(symbol, side, amount, price)
+        record_order(account, symbol, "entry", side=side, qty=amount, price=price,
+                     order_id=(order or {}).get('id'), tp=tp_price, sl=sl_price, tp_sl_attached=tp_sl_attached)
         
-        print(f"{now()} 📊 Ордер відкрито: {side} {symbol}")
+        print(f"{now()} 📊 {account.tag}Ордер відкрито: {side} {symbol}")
         print(f"    💰 Ціна входу: {price:.4f} USDT")
         print(f"    📈 Take Profit: {tp_price} USDT ({tp_percent:.2f}%)")
         print(f"    📉 Stop Loss: {sl_price} USDT ({sl_percent:.2f}%)")
 
-        bybit_symbol = symbol.replace('/', '').replace(':USDT', '')
-        
-        params = {
-            'category': 'linear',
-            'symbol': bybit_symbol,
-            'takeProfit': str(tp_price),
-            'stopLoss': str(sl_price),
-            'tpTriggerBy': 'LastPrice',
-            'slTriggerBy': 'LastPrice',
-            'positionIdx': 0
-        }
-        
-        max_retries = 3
-        tp_sl_success = False
-        
-        for attempt in range(max_retries):
-            try:
-                exchange.private_post_v5_position_trading_stop(params)
-                print(f"{now()} ✅ TP/SL встановлено для {symbol}")
-                tp_sl_success = True
-                break
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"{now()} ⚠️ Спроба {attempt + 1} встановлення TP/SL не вдалася, повтор...")
-                    time.sleep(1)
-                else:
-                    print(f"{now()} ❌ КРИТИЧНА ПОМИЛКА: TP/SL не встановлено для {symbol} після {max_retries} спроб: {e}")
+        tp_sl_success = tp_sl_attached or set_trading_stop(account, symbol, tp_price, sl_price)
+        if not tp_sl_attached:
+            record_order(account, symbol, "tp_sl" if tp_sl_success else "tp_sl_failed", side=side, tp=tp_price, sl=sl_price)
+        if tp_sl_success:
+            latency_name = "order_to_protected" if tp_sl_attached else "order_to_protected_fallback"
+            metrics.observe(latency_name, time.perf_counter() - order_started)
         
         if not tp_sl_success:
             print(f"{now()} 🚨 УВАГА: Закриваю позицію {symbol} через неможливість встановити TP/SL")
-            close_position(symbol, side, "TP/SL failed")
-            send_telegram(f"⚠️ <b>Помилка відкриття позиції</b>\n\n"
+            close_position(account, symbol, side, "TP/SL failed")
+            send_telegram(f"⚠️ {account.tag}<b>Помилка відкриття позиції</b>\n\n"
                          f"Монета: {symbol}\n"
                          f"Причина: TP/SL не встановлено\n"
                          f"Позицію закрито автоматично")
             return False
         
-        last_entry_time[symbol] = time.time()
+        account.last_entry_time[symbol] = time.time()
         
-        position_value = ORDER_SIZE_USDT * LEVERAGE
+        position_value = account.notional * scale
         profit_usdt = position_value * tp_percent / 100
         loss_usdt = position_value * sl_percent / 100
         
         telegram_message = (
-            f"{'🟢' if side == 'LONG' else '🔴'} <b>Нова позиція відкрита!</b>\n\n"
+            f"{'🟢' if side == 'LONG' else '🔴'} {account.tag}<b>Нова позиція відкрита!</b>\n\n"
             f"💰 <b>Монета:</b> {symbol}\n"
             f"📊 <b>Напрямок:</b> {side}\n"
             f"💵 <b>Ціна входу:</b> {price:.4f} USDT\n\n"
@@ -371,7 +741,7 @@ def open_position(symbol, side, atr):
             f"📉 <b>Stop Loss:</b> {sl_price} USDT (-{sl_percent:.2f}%)\n"
             f"❌ <b>Максимальний збиток:</b> ~{loss_usdt:.2f} USDT\n\n"
             f"📊 <b>Розмір:</b> {amount} контрактів\n"
-            f"⚡️ <b>Плече:</b> {LEVERAGE}x\n"
+            f"⚡️ <b>Плече:</b> {account.leverage}x\n"
             f"💼 <b>Обсяг:</b> {position_value:.2f} USDT\n\n"
             f"🕐 {datetime.utcnow().strftime('%d.%m.%Y %H:%M:%S')} UTC"
         )
@@ -381,58 +751,196 @@ def open_position(symbol, side, atr):
         return True
         
     except Exception as e:
-        print(f"{now()} ❌ Помилка відкриття позиції {symbol}: {e}")
+        print(f"{now()} ❌ {account.tag}Помилка відкриття позиції {symbol}: {e}")
         if order_opened:
             print(f"{now()} 🚨 Спроба закрити позицію через помилку...")
-            close_position(symbol, side)
+            close_position(account, symbol, side)
         return False
 
-def signal(df, symbol=""):
-    try:
-        last = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        ema9 = last['EMA9']
-        ema21 = last['EMA21']
-        ema200 = last['EMA200']
-        rsi = last['RSI']
-        price = last['close']
-        volume = last['volume']
-        vol_ema = last['volume_ema']
-        
-        if pd.isna([ema9, ema21, ema200, rsi, vol_ema]).any():
-            return None
-        
-        print(f"{now()} 🔍 {symbol}: price={price:.2f} | EMA9={ema9:.2f} EMA21={ema21:.2f} EMA200={ema200:.2f} | RSI={rsi:.1f} | vol={volume:.0f} avgVol={vol_ema:.0f}")
-        
-        if volume < vol_ema * 1.1:
-            print(f"{now()}    └─ ❌ Низький об'єм, пропускаю")
-            return None
-        
-        in_uptrend = price > ema200
-        in_downtrend = price < ema200
-        
-        if ema9 > ema21 and in_uptrend and last['close'] > last['open'] and rsi > 45 and rsi < 80:
-            if prev['close'] < last['close']:
-                print(f"{now()}    └─ ✅ LONG сигнал!")
-                return "LONG"
-        
-        if ema9 < ema21 and in_downtrend and last['close'] < last['open'] and rsi < 55 and rsi > 20:
-            if prev['close'] > last['close']:
-                print(f"{now()}    └─ ✅ SHORT сигнал!")
-                return "SHORT"
-        
+def signal(df, symbol="", strategy=None):
+    if df is None or len(df) < 2:
         return None
+    return evaluate_signal(df.iloc[-1], df.iloc[-2], symbol, strategy)
+
+@metrics.timed("signal")
+def evaluate_signal(last, prev, symbol="", strategy=None):
+    # Посимвольний шлях (DataFrame); правила - ті самі, що й у entry_masks
+    try:
+        sig = entry_rule(last, prev, strategy or STRATEGY)
+        if sig:
+            print(f"{now()} ✅ {symbol}: {sig} сигнал")
+        return sig
     except Exception as e:
         print(f"{now()} ❌ Помилка генерації сигналу: {e}")
         return None
 
+@metrics.timed("signal_batch")
+def batch_signals(snapshots, strategy=None):
+    try:
+        if not snapshots:
+            return []
+        X = stack_features([(last, prev) for _, last, prev in snapshots])
+        long_mask, short_mask = entry_masks(X, strategy or STRATEGY)
+        return [
+            (snapshots[i][0], "LONG" if long_mask[i] else "SHORT", X[i, SIGNAL_FEATURES["ATR"]])
+            for i in np.flatnonzero(long_mask | short_mask)
+        ]
+    except Exception as e:
+        print(f"{now()} ❌ Помилка пакетної генерації сигналів: {e}")
+        return []
+
+@metrics.timed("exit_batch")
+def batch_exits(snapshots, book):
+    try:
+        if not snapshots:
+            return []
+        X = stack_features([(last, prev) for _, last, prev in snapshots])
+        is_long = np.array([book.side(symbol) == "LONG" for symbol, _, _ in snapshots])
+        mask = exit_mask(X, is_long)
+        return [snapshots[i][0] for i in np.flatnonzero(mask)]
+    except Exception as e:
+        print(f"{now()} ❌ Помилка пакетної перевірки exit signal: {e}")
+        return []
+
+def process_exits(snapshots):
+    # Один набір знімків індикаторів на всі рахунки
+    with trade_lock:
+        for account in accounts:
+            held = [x for x in snapshots if x[0] in account.position_book]
+            for symbol in batch_exits(held, account.position_book):
+                position = account.position_book.get(symbol)
+                if position is None:
+                    continue
+                side = position['side']
+                print(f"{now()} {'🔴' if side == 'LONG' else '🟢'} {account.tag}{symbol} EXIT: розворот EMA9/EMA21 або RSI (було {side})")
+                close_position(account, symbol, side, "EXIT signal", position['entry_price'])
+
+def process_entries(snapshots, note=""):
+    with trade_lock:
+        opened = 0
+        for account in accounts:
+            if account.full:
+                continue
+            free = [x for x in snapshots if x[0] not in account.position_book]
+            # Найсильніші кандидати першими, поки є вільні слоти
+            found = sorted(confirm_higher_timeframe(batch_signals(free, account.strategy)), key=lambda x: -scan_scheduler.score(x[0]))
+            for symbol, sig, atr in found:
+                if account.full:
+                    break
+                if symbol in account.position_book:
+                    continue
+                print(f"\n{now()} 🎯 {account.tag}Сигнал {sig} для {symbol}{note}")
+                if open_position(account, symbol, sig, atr):
+                    opened += 1
+        return opened
+
+def held_symbols():
+    return sorted(set().union(*(account.position_book for account in accounts)))
+
+def apply_ticker_price(symbol, price):
+    # Остання ціна тікера оновлює поточну свічку на місці, без запиту свічок.
+    # Якщо вже почалась нова свічка - None, її довантажить REST
+    buffer = candle_store.get(symbol)
+    if buffer is None or len(buffer) == 0:
+        return None
+    with buffer.lock:
+        if time.time() * 1000 - buffer.last_timestamp >= TIMEFRAME_MS:
+            return None
+        if time.time() - buffer.streamed_at >= STREAM_STALE_SECONDS:
+            bar = buffer.view()[-1].copy()
+            bar[2] = max(bar[2], price)
+            bar[3] = min(bar[3], price)
+            bar[4] = price
+            buffer.merge([bar])
+        return update_indicator_state(symbol, buffer)
+
+def fetch_exit_prices(symbols):
+    # Один запит тікерів на всі відкриті пари; свіжі ціни з WebSocket не перезапитуються
+    stale = [s for s in symbols if time.time() - ticker_cache.get(s, (0, 0))[1] >= TICKER_MAX_AGE]
+    if stale:
+        tickers = exit_data.fetch_tickers(stale, {'type': 'swap', 'subType': 'linear'})
+        for symbol, ticker in tickers.items():
+            if ticker.get('last'):
+                ticker_cache[symbol] = (float(ticker['last']), time.time())
+    return {s: ticker_cache[s][0] for s in symbols if s in ticker_cache}
+
+@metrics.timed("exit_monitor")
+def check_exits():
+    symbols = held_symbols()
+    if not symbols:
+        return
+    prices = fetch_exit_prices(symbols)
+    if PAPER_TRADING:
+        # Симульована біржа перевіряє TP/SL за свіжими цінами, книга звіряється з нею
+        for account in accounts:
+            sync_positions(account, force=True)
+        symbols = held_symbols()
+    snapshots = {}
+    for symbol in symbols:
+        if symbol in prices:
+            snapshots[symbol] = apply_ticker_price(symbol, prices[symbol])
+    # Нова свічка або немає ціни - інкрементальне довантаження свічок
+    missing = [s for s in symbols if snapshots.get(s) is None]
+    snapshots.update(zip(missing, exit_executor.map(lambda s: fetch_indicators(s, client=exit_data), missing)))
+    process_exits([
+        (symbol, snapshot[0], snapshot[1])
+        for symbol, snapshot in snapshots.items()
+        if snapshot is not None and snapshot[2] > 50
+    ])
+
+def run_exit_monitor():
+    # Окремий короткий цикл: виходи не чекають, поки пройде скан усього ринку
+    while True:
+        started = time.time()
+        try:
+            check_exits()
+        except Exception as e:
+            print(f"{now()} ❌ Помилка монітора виходів: {e}")
+        time.sleep(max(0.0, EXIT_MONITOR_SECONDS - (time.time() - started)))
+
+def handle_stream_events(events, candidates):
+    closed = {}
+    for kind, symbol, payload in events:
+        if kind == "candle_closed":
+            closed[symbol] = payload
+        elif kind == "execution":
+            account, item = payload
+            if journal is not None:
+                journal.record_execution(account.name, symbol, item)
+            print(f"{now()} ⚡ {account.tag}Виконання {symbol}: {item.get('side')} {item.get('execQty')} @ {item.get('execPrice')}")
+    
+    snapshots = [(s, last, prev) for s, (last, prev, bars) in closed.items() if bars >= 220 and prev is not None]
+    process_exits(snapshots)
+    # Стріми підписані на весь ринок: входи лише по парах, що пройшли відбір
+    process_entries([item for item in snapshots if item[0] in candidates], " (закриття свічки)")
+
+def wait_for_stream_events(timeout, candidates):
+    deadline = time.time() + timeout
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return
+        try:
+            events = [stream_events.get(timeout=remaining)]
+        except queue.Empty:
+            return
+        while True:
+            try:
+                events.append(stream_events.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            handle_stream_events(events, candidates)
+        except Exception as e:
+            print(f"{now()} ❌ Помилка обробки подій WebSocket: {e}")
+
 def main():
+    global journal
     print(f"\n{'='*60}")
     print(f"🤖 Bybit PRO Scalper Bot запущено о {now()}")
     print(f"{'='*60}")
     print(f"⚙️ Налаштування:")
-    print(f"  • Режим: {'TESTNET' if TESTNET else 'LIVE'}")
+    print(f"  • Режим: {'TESTNET' if TESTNET else 'PAPER' if PAPER_TRADING else 'LIVE'}")
     print(f"  • Розмір позиції: {ORDER_SIZE_USDT} USDT")
     print(f"  • Плече: {LEVERAGE}x")
     print(f"  • Макс. позицій: {MAX_POSITIONS}")
@@ -440,37 +948,86 @@ def main():
     print(f"  • Мін. профіт: {MIN_PROFIT_PERCENT}%")
     print(f"  • Мін. баланс: {MIN_BALANCE_USDT} USDT")
     print(f"  • Cooldown: {COOLDOWN_SECONDS}с")
+    if len(accounts) > 1:
+        print(f"\n👥 Рахунки ({len(accounts)}):")
+        for account in accounts:
+            print(f"  • {account.name}: {account.order_size} USDT x{account.leverage}, макс. {account.max_positions} позицій")
     print(f"\n📊 Індикатори (адаптивні для {TIMEFRAME}):")
     print(f"  • EMA: 9, 21, 200 (тренд)")
     print(f"  • RSI({RSI_WINDOW}) - швидкий моментум")
     print(f"  • ATR({ATR_WINDOW}) - волатильність")
     print(f"  • Volume EMA(20) - фільтр об'єму")
+    if HTF_TIMEFRAMES:
+        print(f"  • Старші таймфрейми з {TIMEFRAME}: {', '.join(HTF_TIMEFRAMES)}")
+    if HTF_CONFIRM_TIMEFRAME:
+        print(f"  • Підтвердження тренду EMA9/EMA21 на {HTF_CONFIRM_TIMEFRAME}")
     print(f"\n🎯 PRO функції:")
     print(f"  ✅ Exit signals (EMA cross + RSI reversal)")
     print(f"  ✅ PnL tracking (winrate, equity)")
     print(f"  ✅ Cooldown захист")
+    if risk_engine is not None:
+        print(f"  ✅ Ризик портфеля: кореляції за {RISK_WINDOW} свічок, макс. {RISK_MAX_CORRELATION}")
+    if EXIT_MONITOR_SECONDS > 0:
+        print(f"  ✅ Монітор виходів кожні {EXIT_MONITOR_SECONDS:g}с")
     print(f"  ✅ Адаптивні параметри (1m/3m/5m)")
     print(f"{'='*60}\n")
     
-    if not API_KEY or not API_SECRET:
+    if METRICS_ENABLED:
+        metrics.enable()
+        if METRICS_PORT:
+            metrics.serve(METRICS_PORT)
+            print(f"{now()} 📈 Метрики Prometheus: http://0.0.0.0:{METRICS_PORT}/metrics")
+    
+    if not PAPER_TRADING and not all(account.api_key and account.api_secret for account in accounts):
         print("❌ ПОМИЛКА: API_KEY та API_SECRET не встановлені!")
         print("📝 Створіть файл .env та додайте:")
         print("   API_KEY=ваш_ключ")
         print("   API_SECRET=ваш_секрет")
         return
     
-    current_balance = get_balance()
-    print(f"{now()} 💰 Поточний баланс: {current_balance:.2f} USDT")
+    balances = {}
+    for account in list(accounts):
+        current_balance = get_balance(account)
+        if current_balance is None:
+            error_msg = f"❌ {account.tag}Не вдалося отримати баланс, рахунок не запущено"
+            print(error_msg)
+            send_telegram(f"🚫 <b>Помилка запуску бота</b>\n\n{error_msg}")
+            accounts.remove(account)
+            continue
+        print(f"{now()} 💰 {account.tag}Поточний баланс: {current_balance:.2f} USDT")
+        balances[account.name] = current_balance
+        
+        if current_balance < MIN_BALANCE_USDT:
+            error_msg = f"❌ {account.tag}Недостатньо коштів! Баланс: {current_balance:.2f} USDT, потрібно мінімум: {MIN_BALANCE_USDT} USDT"
+            print(error_msg)
+            send_telegram(f"🚫 <b>Помилка запуску бота</b>\n\n{error_msg}")
+            accounts.remove(account)
     
-    if current_balance < MIN_BALANCE_USDT:
-        error_msg = f"❌ Недостатньо коштів! Баланс: {current_balance:.2f} USDT, потрібно мінімум: {MIN_BALANCE_USDT} USDT"
-        print(error_msg)
-        send_telegram(f"🚫 <b>Помилка запуску бота</b>\n\n{error_msg}")
+    if not accounts:
         return
     
+    if JOURNAL_PATH:
+        try:
+            journal = TradeJournal(JOURNAL_PATH)
+            for account in accounts:
+                # Cooldown і позиція читання виконань переживають перезапуск
+                account.last_entry_time.update(journal.last_entries(account.name))
+                account.executions_synced_at = journal.last_execution_time(account.name) or int(time.time() * 1000)
+            print(f"{now()} 📒 Журнал угод: {JOURNAL_PATH}")
+        except Exception as e:
+            journal = None
+            print(f"{now()} ⚠️ Журнал угод вимкнено, не вдалося відкрити {JOURNAL_PATH}: {e}")
+    
     try:
-        markets = exchange.fetch_markets()
-        symbols = [s['symbol'] for s in markets if s['quote'] == 'USDT' and s.get('type') == 'swap']
+        if market_table.markets and market_table.age() < MARKETS_REFRESH_SECONDS:
+            # Свіжий кеш з диску: старт без load_markets, повне оновлення - за розкладом
+            print(f"{now()} 📂 Кеш ринків: {len(market_table)} пар ({market_table.age() / 60:.0f} хв тому)")
+            share_markets(market_table.markets)
+            symbols = market_table.symbols()
+            last_markets_refresh = time.time() - market_table.age()
+        else:
+            symbols = refresh_markets()
+            last_markets_refresh = time.time()
         print(f"{now()} 🔹 Знайдено {len(symbols)} торгових пар USDT")
         
         if len(symbols) == 0:
@@ -484,11 +1041,12 @@ def main():
     
     startup_message = (
         f"✅ <b>Бот запущено успішно!</b>\n\n"
-        f"{'🔸 Режим: TESTNET' if TESTNET else '🔴 Режим: LIVE'}\n"
-        f"💰 Баланс: {current_balance:.2f} USDT\n"
+        f"{'🔸 Режим: TESTNET' if TESTNET else '📝 Режим: PAPER' if PAPER_TRADING else '🔴 Режим: LIVE'}\n"
+        f"💰 Баланс: {sum(balances[account.name] for account in accounts):.2f} USDT\n"
         f"📊 Розмір позиції: {ORDER_SIZE_USDT} USDT\n"
         f"⚡️ Плече: {LEVERAGE}x\n"
         f"📈 Макс. позицій: {MAX_POSITIONS}\n"
+        f"👥 Рахунків: {len(accounts)}\n"
         f"⏱ Таймфрейм: {TIMEFRAME}\n"
         f"💚 Мін. профіт: {MIN_PROFIT_PERCENT}%\n"
         f"🪙 Торгових пар: {len(symbols)}\n\n"
@@ -496,98 +1054,143 @@ def main():
     )
     send_telegram(startup_message)
     
+    start_streams(symbols)
+    if EXIT_MONITOR_SECONDS > 0:
+        threading.Thread(target=run_exit_monitor, name="exit-monitor", daemon=True).start()
+    
     scan_count = 0
     last_balance_check = time.time()
     last_pnl_report = time.time()
+    last_metrics_report = time.time()
+    last_universe_refresh = 0
+    candidates = list(symbols)
+    candidate_set = set(candidates)
+    errors = 0
+    first_scan = True
     
     while True:
         try:
             scan_count += 1
             
             if time.time() - last_balance_check > 3600:
-                current_balance = get_balance()
-                print(f"{now()} 💰 Перевірка балансу: {current_balance:.2f} USDT")
-                
-                if current_balance < MIN_BALANCE_USDT:
-                    warning_msg = f"⚠️ Низький баланс: {current_balance:.2f} USDT (мінімум: {MIN_BALANCE_USDT} USDT)"
-                    print(f"{now()} {warning_msg}")
-                    send_telegram(f"⚠️ <b>Попередження про баланс</b>\n\n{warning_msg}")
+                for account in accounts:
+                    current_balance = get_balance(account)
+                    if current_balance is None:
+                        continue
+                    print(f"{now()} 💰 {account.tag}Перевірка балансу: {current_balance:.2f} USDT")
+                    
+                    if current_balance < MIN_BALANCE_USDT:
+                        warning_msg = f"⚠️ {account.tag}Низький баланс: {current_balance:.2f} USDT (мінімум: {MIN_BALANCE_USDT} USDT)"
+                        print(f"{now()} {warning_msg}")
+                        send_telegram(f"⚠️ <b>Попередження про баланс</b>\n\n{warning_msg}")
                 
                 last_balance_check = time.time()
             
-            if time.time() - last_pnl_report > 3600 and pnl_stats["total_trades"] > 0:
-                print_pnl_stats()
+            if time.time() - last_pnl_report > 3600:
+                for account in accounts:
+                    print_pnl_stats(account)
                 last_pnl_report = time.time()
             
-            open_positions = get_open_positions()
+            if metrics.enabled and time.time() - last_metrics_report > METRICS_REPORT_SECONDS:
+                print(f"\n{now()} ⏱ Затримки за останні {METRICS_REPORT_SECONDS}с:\n{metrics.report()}\n")
+                last_metrics_report = time.time()
             
-            for pos in open_positions:
+            if time.time() - last_markets_refresh > MARKETS_REFRESH_SECONDS:
+                last_markets_refresh = time.time()
                 try:
-                    pos_symbol = pos.get('symbol')
-                    contracts = float(pos.get('contracts', 0))
-                    if abs(contracts) == 0:
-                        continue
-                    
-                    pos_side = "LONG" if contracts > 0 else "SHORT"
-                    entry_price = float(pos.get('entryPrice', 0))
-                    
-                    df = fetch_ohlcv(pos_symbol, limit=100)
-                    if df is not None and len(df) > 50:
-                        df = calculate_indicators(df)
-                        if df is not None and exit_signal(df, pos_side, pos_symbol):
-                            close_position(pos_symbol, pos_side, "EXIT signal", entry_price)
-                            time.sleep(1)
-                except Exception:
-                    continue
+                    symbols = refresh_markets()
+                    print(f"{now()} 🔄 Ринки оновлено: {len(symbols)} пар")
+                    last_universe_refresh = 0
+                except Exception as e:
+                    print(f"{now()} ⚠️ Помилка оновлення ринків: {e}")
+            
+            if time.time() - last_universe_refresh > UNIVERSE_REFRESH_SECONDS:
+                last_universe_refresh = time.time()
+                try:
+                    candidates = select_universe(symbols) or candidates
+                    candidate_set = set(candidates)
+                    scan_scheduler.forget(candidates)
+                    print(f"{now()} 🧮 Відібрано {len(candidates)}/{len(symbols)} пар за оборотом, спредом і волатильністю")
+                except Exception as e:
+                    print(f"{now()} ⚠️ Помилка відбору пар, сканую попередній список: {e}")
+            
+            for account in accounts:
+                sync_positions(account)
             
-            open_positions = get_open_positions()
+            # Без окремого монітора виходи перевіряються раз за цикл.
+            # Свічки та індикатори рахуються один раз для всіх рахунків
+            if EXIT_MONITOR_SECONDS <= 0:
+                exit_snapshots = []
+                for pos_symbol, snapshot in scan_market(held_symbols(), throttled=False):
+                    if snapshot is not None and snapshot[2] > 50:
+                        exit_snapshots.append((pos_symbol, snapshot[0], snapshot[1]))
+                process_exits(exit_snapshots)
             
-            print(f"\n{now()} 🔍 Скан #{scan_count} | Позицій: {len(open_positions)}/{MAX_POSITIONS}")
+            open_count = sum(len(account.position_book) for account in accounts)
+            max_count = sum(account.max_positions for account in accounts)
+            print(f"\n{now()} 🔍 Скан #{scan_count} | Позицій: {open_count}/{max_count}")
             
-            if len(open_positions) >= MAX_POSITIONS:
-                print(f"{now()} ⏸️ Досягнуто максимум позицій ({MAX_POSITIONS})")
-                time.sleep(60)
+            if all(account.full for account in accounts):
+                print(f"{now()} ⏸️ Досягнуто максимум позицій ({max_count})")
+                wait_for_stream_events(60, candidate_set)
+                continue
+            
+            if not scan_breaker.allow():
+                print(f"{now()} ⛔ Скан пропущено: API нестабільне, пауза ще {scan_breaker.remaining():.0f}с")
+                wait_for_stream_events(scan_breaker.remaining(), candidate_set)
                 continue
             
             positions_opened = 0
+            # Пара пропускається, лише якщо вона вже відкрита на всіх рахунках з вільними слотами
+            free_accounts = [account for account in accounts if not account.full]
+            scan_symbols = scan_scheduler.order(
+                [s for s in candidates if not all(s in account.position_book for account in free_accounts)],
+                SCAN_BUDGET,
+            )
+            scan_started = time.time()
+            scanned = 0
             
-            for symbol in symbols:
-                if len(open_positions) + positions_opened >= MAX_POSITIONS:
-                    break
-                    
-                if any(p.get('symbol') == symbol for p in open_positions):
+            pending = []
+            
+            for symbol, snapshot in scan_market(scan_symbols):
+                scanned += 1
+                scan_scheduler.record(symbol, snapshot)
+                if snapshot is not None and snapshot[2] >= 220 and snapshot[1] is not None:
+                    pending.append((symbol, snapshot[0], snapshot[1]))
+                if len(pending) < SIGNAL_BATCH_SIZE and scanned < len(scan_symbols):
                     continue
                 
-                try:
-                    df = fetch_ohlcv(symbol)
-                    if df is None or len(df) < 220:
-                        continue
-                    
-                    df = calculate_indicators(df)
-                    if df is None:
-                        continue
-                    
-                    sig = signal(df, symbol)
-                    if sig:
-                        print(f"\n{now()} 🎯 Сигнал {sig} для {symbol}")
-                        if open_position(symbol, sig, df.iloc[-1]['ATR']):
-                            positions_opened += 1
-                            time.sleep(2)
-                        
-                except Exception as e:
-                    continue
+                positions_opened += process_entries(pending)
+                pending = []
+                
+                if all(account.full for account in accounts):
+                    break
+            
+            metrics.observe("scan", time.time() - scan_started)
+            print(f"{now()} ⏱ Скан #{scan_count}: {scanned}/{len(scan_symbols)} пар за {time.time() - scan_started:.1f}с")
+            if first_scan:
+                first_scan = False
+                metrics.observe("startup_to_first_scan", time.time() - STARTED_AT)
+                print(f"{now()} 🚀 Від запуску до першого скану: {time.time() - STARTED_AT:.1f}с")
             
             if positions_opened > 0:
                 print(f"\n{now()} ✨ Відкрито нових позицій: {positions_opened}")
             
-            time.sleep(30)
+            wait_for_stream_events(30, candidate_set)
+            errors = 0
             
         except KeyboardInterrupt:
             print(f"\n\n{now()} 🛑 Бот зупинено користувачем")
+            if journal is not None:
+                journal.flush()
+            if notifier is not None:
+                notifier.flush()
             break
         except Exception as e:
-            print(f"{now()} ❌ Критична помилка: {e}")
-            time.sleep(60)
+            errors += 1
+            delay = backoff_delay(errors, base=2, cap=60)
+            print(f"{now()} ❌ Критична помилка: {e} (повтор через {delay:.0f}с)")
+            time.sleep(delay)
 
 if __name__ == "__main__":
     main()
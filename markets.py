@@ -0,0 +1,124 @@
+import json
+import math
+import os
+import threading
+import time
+from decimal import Decimal
+
+
+def step_decimals(step):
+    return max(0, -Decimal(str(step)).normalize().as_tuple().exponent)
+
+
+def _float(value, default):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def market_entry(market):
+    # Бере уніфіковані поля ccxt, а якщо їх немає - сирі фільтри Bybit
+    info = market.get('info') or {}
+    price_filter = info.get('priceFilter') or {}
+    lot_filter = info.get('lotSizeFilter') or {}
+    leverage_filter = info.get('leverageFilter') or {}
+    precision = market.get('precision') or {}
+    limits = market.get('limits') or {}
+
+    tick_size = _float(price_filter.get('tickSize'), _float(precision.get('price'), 0.01))
+    qty_step = _float(lot_filter.get('qtyStep'), _float(precision.get('amount'), 0.001))
+    min_qty = _float(lot_filter.get('minOrderQty'), _float((limits.get('amount') or {}).get('min'), qty_step))
+    min_notional = _float(lot_filter.get('minNotionalValue'), _float((limits.get('cost') or {}).get('min'), 0.0))
+    max_leverage = _float(leverage_filter.get('maxLeverage'), _float((limits.get('leverage') or {}).get('max'), 1.0))
+    return {
+        'tick_size': tick_size,
+        'qty_step': qty_step,
+        'min_qty': min_qty,
+        'min_notional': min_notional,
+        'max_leverage': max_leverage,
+        'price_decimals': step_decimals(tick_size),
+        'qty_decimals': step_decimals(qty_step),
+    }
+
+
+class MarketTable:
+    # Компактна таблиця точності торгових пар: без звернень до біржі при вході.
+    # Поруч зберігаються сирі ринки ccxt цих пар, щоб після перезапуску
+    # передати їх клієнтам через set_markets без load_markets
+    def __init__(self, entries=None, updated_at=0.0, markets=None):
+        self.entries = entries or {}
+        self.updated_at = updated_at
+        self.markets = markets or []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, symbol):
+        return symbol in self.entries
+
+    def get(self, symbol):
+        return self.entries.get(symbol)
+
+    def symbols(self):
+        return list(self.entries)
+
+    def age(self):
+        return time.time() - self.updated_at
+
+    def update(self, markets, quote='USDT'):
+        # Лише активні лінійні безстрокові контракти, як і в скані
+        markets = [
+            m for m in markets
+            if m.get('quote') == quote and m.get('type') == 'swap' and m.get('active', True) is not False
+        ]
+        entries = {m['symbol']: market_entry(m) for m in markets}
+        with self.lock:
+            self.entries = entries
+            self.markets = markets
+            self.updated_at = time.time()
+        return entries
+
+    def round_price(self, symbol, price, round_up=True):
+        entry = self.entries.get(symbol)
+        tick, decimals = (entry['tick_size'], entry['price_decimals']) if entry else (0.01, 2)
+        # Невеликий допуск, щоб 0.30000000000000004 / 0.1 не давало зайвий тік
+        ticks = price / tick
+        ticks = math.ceil(ticks - 1e-9) if round_up else math.floor(ticks + 1e-9)
+        return round(ticks * tick, decimals)
+
+    def amount_for(self, symbol, notional, price):
+        # Кількість, кратна кроку лоту; 0 якщо не проходить мінімуми біржі
+        entry = self.entries.get(symbol)
+        if entry is None:
+            return round(notional / price, 6)
+        step = entry['qty_step']
+        amount = round(math.floor(notional / price / step + 1e-9) * step, entry['qty_decimals'])
+        if amount < entry['min_qty'] or amount * price < entry['min_notional']:
+            return 0.0
+        return amount
+
+    def leverage_for(self, symbol, leverage):
+        entry = self.entries.get(symbol)
+        if entry is None:
+            return leverage
+        return int(min(leverage, entry['max_leverage']))
+
+    def save(self, path):
+        with self.lock:
+            payload = {'updated_at': self.updated_at, 'markets': self.entries, 'ccxt': self.markets}
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        return cls(payload.get('markets') or {}, float(payload.get('updated_at') or 0), payload.get('ccxt'))
@@ -0,0 +1,166 @@
+import bisect
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Межі кошиків у секундах: від 10 мкс до ~100 с з кроком 20%
+BOUNDS = [1e-5 * 1.2 ** i for i in range(90)]
+QUANTILES = (0.5, 0.95, 0.99)
+
+enabled = False
+histograms = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(BOUNDS, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.total, self.count
+
+
+def quantile(counts, q):
+    total = sum(counts)
+    if total == 0:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return BOUNDS[min(index, len(BOUNDS) - 1)]
+    return BOUNDS[-1]
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def observe(name, seconds):
+    if not enabled:
+        return
+    histogram = histograms.get(name)
+    if histogram is None:
+        with _lock:
+            histogram = histograms.setdefault(name, Histogram())
+    histogram.observe(seconds)
+
+
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+_last_report = {}
+
+
+def report():
+    # Підсумок з моменту попереднього звіту
+    lines = []
+    for name in sorted(histograms):
+        counts, total, count = histograms[name].snapshot()
+        prev_counts, prev_total, prev_count = _last_report.get(name, ([0] * len(counts), 0.0, 0))
+        _last_report[name] = (counts, total, count)
+        delta = [a - b for a, b in zip(counts, prev_counts)]
+        n = count - prev_count
+        if n == 0:
+            continue
+        p50, p95, p99 = (quantile(delta, q) * 1000 for q in QUANTILES)
+        avg = (total - prev_total) / n * 1000
+        lines.append(f"  • {name:<22} n={n:<6} avg={avg:8.2f}ms p50={p50:8.2f}ms p95={p95:8.2f}ms p99={p99:8.2f}ms")
+    return "\n".join(lines)
+
+
+def prometheus_text():
+    lines = [
+        "# HELP bot_span_seconds Latency of bot hot-path stages",
+        "# TYPE bot_span_seconds summary",
+    ]
+    for name in sorted(histograms):
+        counts, total, count = histograms[name].snapshot()
+        for q in QUANTILES:
+            lines.append(f'bot_span_seconds{{span="{name}",quantile="{q}"}} {quantile(counts, q):.6f}')
+        lines.append(f'bot_span_seconds_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f'bot_span_seconds_count{{span="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port):
+    server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
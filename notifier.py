@@ -0,0 +1,96 @@
+import collections
+import random
+import threading
+import time
+
+import requests
+
+from clock import now
+import metrics
+
+MAX_MESSAGE_LENGTH = 4000
+
+
+class TelegramNotifier:
+    # Відправка у фоновому потоці: торговий цикл лише кладе повідомлення в чергу
+    def __init__(self, token, chat_id, max_queue=100, coalesce_seconds=1.0, max_retries=5):
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.coalesce_seconds = coalesce_seconds
+        self.max_retries = max_retries
+        self.queue = collections.deque(maxlen=max_queue)
+        self.cond = threading.Condition()
+        self.session = requests.Session()
+        self.dropped = 0
+        self.busy = False
+        self.thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+        self.thread.start()
+
+    def send(self, message):
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(message)
+            self.cond.notify()
+
+    def flush(self, timeout=5.0):
+        deadline = time.time() + timeout
+        with self.cond:
+            while (self.queue or self.busy) and time.time() < deadline:
+                self.cond.wait(0.1)
+
+    def _next_batch(self):
+        with self.cond:
+            while not self.queue:
+                self.cond.wait()
+            # Чекаємо трохи, щоб зібрати сплеск повідомлень в одне
+            deadline = time.time() + self.coalesce_seconds
+            while time.time() < deadline:
+                self.cond.wait(max(0.0, deadline - time.time()))
+            batch = []
+            length = 0
+            while self.queue and length + len(self.queue[0]) + 2 <= MAX_MESSAGE_LENGTH:
+                message = self.queue.popleft()
+                batch.append(message)
+                length += len(message) + 2
+            if not batch:
+                batch.append(self.queue.popleft()[:MAX_MESSAGE_LENGTH])
+            dropped, self.dropped = self.dropped, 0
+            self.busy = True
+        if dropped:
+            batch.append(f"⚠️ Пропущено {dropped} повідомлень (черга переповнена)")
+        return "\n\n".join(batch)
+
+    def _post(self, text):
+        for attempt in range(self.max_retries):
+            try:
+                with metrics.span("telegram_post"):
+                    response = self.session.post(
+                        self.url,
+                        data={"chat_id": self.chat_id, "text": text, "parse_mode": "HTML"},
+                        timeout=10,
+                    )
+                if response.status_code == 429:
+                    retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                    time.sleep(retry_after)
+                    continue
+                if response.status_code >= 500:
+                    raise requests.HTTPError(f"HTTP {response.status_code}")
+                if response.status_code != 200:
+                    print(f"{now()} ⚠️ Telegram відхилив повідомлення: {response.text[:200]}")
+                return
+            except Exception as e:
+                delay = min(30, 2 ** attempt) * (0.5 + random.random() / 2)
+                print(f"{now()} ⚠️ Помилка відправки Telegram ({e}), повтор через {delay:.1f}с")
+                time.sleep(delay)
+        print(f"{now()} ❌ Telegram: повідомлення не відправлено після {self.max_retries} спроб")
+
+    def _run(self):
+        while True:
+            text = self._next_batch()
+            try:
+                self._post(text)
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
@@ -0,0 +1,143 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import default_params, feature_matrix, load_data, prepare_symbol, run_backtest
+from clock import now
+
+SPACE = {
+    "atr_window": [7, 10, 14],
+    "rsi_window": [3, 4, 5, 7],
+    "rsi_long_min": [40, 45, 50],
+    "rsi_short_max": [50, 55, 60],
+    "volume_factor": [1.0, 1.1, 1.3, 1.5],
+    "tp_atr_mult": [2.0, 3.0, 4.0],
+    "sl_atr_mult": [1.0, 1.5, 2.0],
+}
+
+SORT_KEYS = {
+    "pnl": ("total_pnl", True),
+    "winrate": ("winrate", True),
+    "drawdown": ("max_drawdown", False),
+    "profit_factor": ("profit_factor", True),
+}
+
+_shm = None
+_data = None
+_features = {}
+
+
+def share_candles(data):
+    # Усі свічки в одному блоці спільної пам'яті; воркери отримують лише зміщення
+    symbols = list(data)
+    offsets = np.cumsum([0] + [len(data[s]) for s in symbols])
+    total = int(offsets[-1])
+    shm = shared_memory.SharedMemory(create=True, size=max(1, total * 6 * 8))
+    block = np.ndarray((total, 6), dtype=np.float64, buffer=shm.buf)
+    for symbol, start, end in zip(symbols, offsets[:-1], offsets[1:]):
+        block[start:end] = data[symbol]
+    layout = [(symbol, int(start), int(end)) for symbol, start, end in zip(symbols, offsets[:-1], offsets[1:])]
+    return shm, layout, total
+
+
+def attach(name, layout, total):
+    global _shm, _data
+    _shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((total, 6), dtype=np.float64, buffer=_shm.buf)
+    _data = {symbol: block[start:end] for symbol, start, end in layout}
+
+
+def evaluate(params):
+    # Індикатори залежать лише від вікон, тому кешуються між завданнями воркера
+    key = (params["rsi_window"], params["atr_window"])
+    if key not in _features:
+        if len(_features) >= 4:
+            _features.pop(next(iter(_features)))
+        _features[key] = {symbol: feature_matrix(candles, params) for symbol, candles in _data.items()}
+    features = _features[key]
+    prepared = {symbol: prepare_symbol(candles, params, features[symbol]) for symbol, candles in _data.items()}
+    _, stats = run_backtest(_data, params, prepared)
+    return stats
+
+
+def grid(space):
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def sample(space, count, seed):
+    rng = random.Random(seed)
+    seen = set()
+    total = int(np.prod([len(v) for v in space.values()]))
+    while len(seen) < min(count, total):
+        combo = tuple(rng.choice(space[k]) for k in space)
+        if combo not in seen:
+            seen.add(combo)
+            yield dict(zip(space, combo))
+
+
+def optimize(data, base_params, configs, workers=None, sort="pnl"):
+    shm, layout, total = share_candles(data)
+    configs = sorted(configs, key=lambda c: (c.get("rsi_window", 0), c.get("atr_window", 0)))
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach, initargs=(shm.name, layout, total)) as pool:
+            futures = {pool.submit(evaluate, {**base_params, **config}): config for config in configs}
+            for done, future in enumerate(as_completed(futures), 1):
+                results.append({**futures[future], **future.result()})
+                if done % 10 == 0 or done == len(futures):
+                    print(f"{now()} ⚙️ Перевірено {done}/{len(futures)} конфігурацій")
+    finally:
+        shm.close()
+        shm.unlink()
+    key, descending = SORT_KEYS[sort]
+    results.sort(key=lambda r: r[key], reverse=descending)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пошук параметрів стратегії на бектесті")
+    parser.add_argument("--data", default="candles")
+    parser.add_argument("--timeframe", default=None)
+    parser.add_argument("--space", default=None, help="JSON з сіткою параметрів замість стандартної")
+    parser.add_argument("--random", type=int, default=0, help="кількість випадкових конфігурацій (0 = повна сітка)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sort", choices=list(SORT_KEYS), default="pnl")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", default=None, help="CSV з усіма результатами")
+    args = parser.parse_args()
+
+    space = SPACE
+    if args.space:
+        with open(args.space, encoding="utf-8") as f:
+            space = json.load(f)
+
+    started = time.time()
+    base_params = default_params(args.timeframe)
+    data = load_data(args.data, base_params["timeframe"])
+    configs = list(sample(space, args.random, args.seed) if args.random else grid(space))
+    print(f"{now()} 📂 {len(data)} пар, {len(configs)} конфігурацій, {args.workers} процесів")
+
+    results = optimize(data, base_params, configs, args.workers, args.sort)
+    table = pd.DataFrame(results)
+    if args.output:
+        table.to_csv(args.output, index=False)
+
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(f"\n🏆 Топ-{args.top} за {args.sort}:")
+        print(table.head(args.top).to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    print(f"\n{now()} ⏱ Готово за {time.time() - started:.1f}с")
+
+
+if __name__ == "__main__":
+    main()
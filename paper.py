@@ -0,0 +1,139 @@
+import itertools
+import threading
+import time
+
+
+def market_id(symbol):
+    return symbol.replace('/', '').replace(':USDT', '')
+
+
+class PaperExchange:
+    # Симульована біржа в процесі: ті самі виклики ccxt, що й у бота, без ключів.
+    # Ринкові ордери виконуються за поточною ціною з price(symbol), TP/SL спрацьовують
+    # при наступному запиті позицій. Виконання - у форматі Bybit v5, як для журналу
+    def __init__(self, price, balance=1000.0, fee_percent=0.055):
+        self.price = price
+        self.fee = fee_percent / 100
+        self.cash = float(balance)
+        self.positions = {}
+        self.trades = []
+        self.leverage = {}
+        self.markets = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = {m['symbol']: m for m in markets}
+
+    def set_leverage(self, leverage, symbol, params=None):
+        self.leverage[symbol] = int(leverage)
+
+    def _fill(self, symbol, side, amount, price, stop_order_type=None):
+        # side: 'buy'/'sell'; позиція в one-way режимі, знак - напрямок
+        signed = amount if side == 'buy' else -amount
+        position = self.positions.get(symbol)
+        current = position['contracts'] if position else 0.0
+        fee = amount * price * self.fee
+        self.cash -= fee
+        closed = 0.0
+        if current and (current > 0) != (signed > 0):
+            closed = min(abs(signed), abs(current))
+            self.cash += (price - position['entry_price']) * closed * (1 if current > 0 else -1)
+        total = current + signed
+        if abs(total) < 1e-12:
+            self.positions.pop(symbol, None)
+        elif position is None or (current > 0) != (total > 0):
+            self.positions[symbol] = {'contracts': total, 'entry_price': price, 'tp': None, 'sl': None}
+        else:
+            if abs(total) > abs(current):
+                position['entry_price'] = (position['entry_price'] * abs(current) + price * abs(signed)) / abs(total)
+            position['contracts'] = total
+        order_id = str(next(self.ids))
+        timestamp = int(time.time() * 1000)
+        self.trades.append({
+            'symbol': symbol,
+            'timestamp': timestamp,
+            'info': {
+                'execId': f"paper-{order_id}",
+                'execTime': str(timestamp),
+                'side': 'Buy' if side == 'buy' else 'Sell',
+                'execQty': str(amount),
+                'execPrice': str(price),
+                'execFee': str(fee),
+                'execType': 'Trade',
+                'stopOrderType': stop_order_type,
+                'orderId': order_id,
+                'closedSize': str(closed),
+            },
+        })
+        return {'id': order_id, 'symbol': symbol, 'side': side, 'amount': amount, 'price': price}
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        params = params or {}
+        fill_price = float(self.price(symbol))
+        with self.lock:
+            position = self.positions.get(symbol)
+            if params.get('reduceOnly'):
+                if position is None or (position['contracts'] > 0) == (side == 'buy'):
+                    return {'id': None, 'symbol': symbol}
+                amount = min(amount, abs(position['contracts']))
+            order = self._fill(symbol, side, amount, fill_price)
+            position = self.positions.get(symbol)
+            if position is not None and (params.get('takeProfit') or params.get('stopLoss')):
+                position['tp'] = float(params['takeProfit']) if params.get('takeProfit') else None
+                position['sl'] = float(params['stopLoss']) if params.get('stopLoss') else None
+            return order
+
+    def create_market_order(self, symbol, side, amount, params=None):
+        return self.create_order(symbol, 'market', side, amount, None, params)
+
+    def private_post_v5_position_trading_stop(self, params):
+        with self.lock:
+            for symbol, position in self.positions.items():
+                if market_id(symbol) == params.get('symbol'):
+                    position['tp'] = float(params['takeProfit']) if params.get('takeProfit') else None
+                    position['sl'] = float(params['stopLoss']) if params.get('stopLoss') else None
+                    return {'retCode': 0}
+        raise ValueError(f"немає позиції {params.get('symbol')}")
+
+    def mark(self):
+        # TP/SL за поточною ціною: виконання за рівнем стопа, як тригер LastPrice
+        for symbol in list(self.positions):
+            price = float(self.price(symbol))
+            with self.lock:
+                position = self.positions.get(symbol)
+                if position is None:
+                    continue
+                is_long = position['contracts'] > 0
+                tp, sl = position['tp'], position['sl']
+                close_side = 'sell' if is_long else 'buy'
+                amount = abs(position['contracts'])
+                if tp and (price >= tp if is_long else price <= tp):
+                    self._fill(symbol, close_side, amount, tp, 'TakeProfit')
+                elif sl and (price <= sl if is_long else price >= sl):
+                    self._fill(symbol, close_side, amount, sl, 'StopLoss')
+
+    def fetch_positions(self, symbols=None, params=None):
+        self.mark()
+        with self.lock:
+            return [
+                {
+                    'symbol': symbol,
+                    'contracts': abs(p['contracts']),
+                    'side': 'long' if p['contracts'] > 0 else 'short',
+                    'entryPrice': p['entry_price'],
+                }
+                for symbol, p in self.positions.items()
+                if symbols is None or symbol in symbols
+            ]
+
+    def fetch_balance(self, params=None):
+        with self.lock:
+            margin = sum(abs(p['contracts']) * p['entry_price'] / self.leverage.get(symbol, 1)
+                         for symbol, p in self.positions.items())
+            return {'USDT': {'free': self.cash - margin, 'used': margin, 'total': self.cash}}
+
+    def fetch_my_trades(self, symbol=None, since=None, limit=None, params=None):
+        with self.lock:
+            trades = [t for t in self.trades if since is None or t['timestamp'] >= since]
+        return trades[:limit] if limit else trades
@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+def position_side(position):
+    side = (position.get('side') or '').lower()
+    if side in ('long', 'buy'):
+        return "LONG"
+    if side in ('short', 'sell'):
+        return "SHORT"
+    contracts = float(position.get('contracts') or 0)
+    return "LONG" if contracts > 0 else "SHORT"
+
+
+class PositionBook:
+    def __init__(self):
+        self.positions = {}
+        self.synced_at = 0.0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, symbol):
+        return symbol in self.positions
+
+    def __iter__(self):
+        return iter(list(self.positions))
+
+    def get(self, symbol):
+        return self.positions.get(symbol)
+
+    def side(self, symbol):
+        position = self.positions.get(symbol)
+        return position['side'] if position else None
+
+    def add(self, symbol, side, contracts, entry_price):
+        with self.lock:
+            self.positions[symbol] = {
+                'symbol': symbol,
+                'side': side,
+                'contracts': abs(float(contracts)),
+                'entry_price': float(entry_price or 0),
+                'updated_at': time.time(),
+            }
+
+    def remove(self, symbol):
+        with self.lock:
+            return self.positions.pop(symbol, None)
+
+    def invalidate(self):
+        self.synced_at = 0.0
+
+    def sync(self, positions):
+        # Звірка з REST: біржа - джерело істини
+        book = {}
+        for p in positions:
+            contracts = float(p.get('contracts') or 0)
+            if abs(contracts) == 0:
+                continue
+            book[p.get('symbol')] = {
+                'symbol': p.get('symbol'),
+                'side': position_side(p),
+                'contracts': abs(contracts),
+                'entry_price': float(p.get('entryPrice') or 0),
+                'updated_at': time.time(),
+            }
+        with self.lock:
+            self.positions = book
+            self.synced_at = time.time()
+
+    def apply_stream(self, symbol, item):
+        size = float(item.get('size') or 0)
+        if size == 0 or not item.get('side'):
+            self.remove(symbol)
+            return
+        self.add(symbol, position_side(item), size, item.get('entryPrice') or item.get('avgPrice'))
@@ -0,0 +1,159 @@
+import math
+import threading
+
+import numpy as np
+
+
+class RiskEngine:
+    # Ковзні лог-доходності закритих свічок (кільце на window свічок на пару) і
+    # волатильність ATR/ціна. Оновлення - O(1) на нову свічку; кореляції рахуються
+    # лише для пар, що мають значення при вході (кандидат × відкриті позиції),
+    # тож повної матриці N×N на кожен скан немає
+    def __init__(self, timeframe_ms, window, max_correlation=0.8, min_size=0.25, capacity=256):
+        self.timeframe_ms = timeframe_ms
+        self.window = window
+        self.max_correlation = max_correlation
+        self.min_size = min_size
+        self.min_bars = max(2, window // 2)
+        self.index = {}
+        self.returns = np.zeros((capacity, window), dtype=np.float64)
+        self.sums = np.zeros(capacity, dtype=np.float64)
+        self.sumsq = np.zeros(capacity, dtype=np.float64)
+        self.filled = np.zeros(capacity, dtype=np.int64)
+        self.last_bucket = np.full(capacity, -1, dtype=np.int64)
+        self.last_close = np.zeros(capacity, dtype=np.float64)
+        self.vol = np.full(capacity, np.nan, dtype=np.float64)
+        self.lock = threading.Lock()
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def _row(self, symbol):
+        row = self.index.get(symbol)
+        if row is not None:
+            return row
+        row = len(self.index)
+        if row == len(self.returns):
+            grow = len(self.returns)
+            self.returns = np.concatenate((self.returns, np.zeros((grow, self.window))))
+            self.sums = np.concatenate((self.sums, np.zeros(grow)))
+            self.sumsq = np.concatenate((self.sumsq, np.zeros(grow)))
+            self.filled = np.concatenate((self.filled, np.zeros(grow, dtype=np.int64)))
+            self.last_bucket = np.concatenate((self.last_bucket, np.full(grow, -1, dtype=np.int64)))
+            self.last_close = np.concatenate((self.last_close, np.zeros(grow)))
+            self.vol = np.concatenate((self.vol, np.full(grow, np.nan)))
+        self.index[symbol] = row
+        return row
+
+    def _write(self, row, bucket, value):
+        col = bucket % self.window
+        old = self.returns[row, col]
+        self.returns[row, col] = value
+        self.sums[row] += value - old
+        self.sumsq[row] += value * value - old * old
+        self.filled[row] = min(self.window, self.filled[row] + 1)
+        if col == 0:
+            # Раз на кільце - точні суми, щоб похибка не накопичувалась
+            self.sums[row] = self.returns[row].sum()
+            self.sumsq[row] = np.dot(self.returns[row], self.returns[row])
+
+    def _seed(self, row, closed):
+        # Уся історія одним векторним проходом; пропущені свічки лишаються нулями
+        bars = closed[-(self.window + 1):]
+        buckets = (bars[1:, 0] // self.timeframe_ms).astype(np.int64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.log(bars[1:, 4] / bars[:-1, 4])
+        keep = buckets > buckets[-1] - self.window
+        self.returns[row] = 0.0
+        self.returns[row, buckets[keep] % self.window] = np.nan_to_num(values[keep], nan=0.0, posinf=0.0, neginf=0.0)
+        self.sums[row] = self.returns[row].sum()
+        self.sumsq[row] = np.dot(self.returns[row], self.returns[row])
+        self.filled[row] = int(keep.sum())
+        self.last_bucket[row] = buckets[-1]
+        self.last_close[row] = bars[-1, 4]
+
+    def update(self, symbol, bars, atr):
+        # bars - буфер свічок пари, остання ще формується і не враховується
+        if len(bars) < 3:
+            return
+        closed = bars[:-1]
+        bucket = int(closed[-1, 0] // self.timeframe_ms)
+        with self.lock:
+            row = self._row(symbol)
+            if atr == atr and closed[-1, 4] > 0:
+                self.vol[row] = atr / closed[-1, 4]
+            last = self.last_bucket[row]
+            if bucket <= last:
+                return
+            if last < 0 or bucket - last > self.window:
+                self._seed(row, closed)
+                return
+            new = closed[closed[:, 0] // self.timeframe_ms > last]
+            prev = self.last_close[row]
+            for bar in new:
+                current = int(bar[0] // self.timeframe_ms)
+                # Пропущені свічки - нульова доходність, щоб кільця пар лишались вирівняними
+                for gap in range(last + 1, current):
+                    self._write(row, gap, 0.0)
+                self._write(row, current, math.log(bar[4] / prev) if prev > 0 and bar[4] > 0 else 0.0)
+                prev = bar[4]
+                last = current
+            self.last_bucket[row] = last
+            self.last_close[row] = prev
+
+    def _corr(self, rows_a, rows_b):
+        # Кореляції Пірсона рядків a × b з ковзних сум; невідомі (мало історії,
+        # різний час останньої свічки) - 0
+        n = self.window
+        a, b = np.asarray(rows_a), np.asarray(rows_b)
+        mean_a, mean_b = self.sums[a] / n, self.sums[b] / n
+        var_a = np.maximum(self.sumsq[a] / n - mean_a ** 2, 0.0)
+        var_b = np.maximum(self.sumsq[b] / n - mean_b ** 2, 0.0)
+        cov = self.returns[a] @ self.returns[b].T / n - np.outer(mean_a, mean_b)
+        denom = np.sqrt(np.outer(var_a, var_b))
+        corr = np.divide(cov, denom, out=np.zeros_like(cov), where=denom > 0)
+        known = np.outer(self.filled[a] >= self.min_bars, self.filled[b] >= self.min_bars)
+        known &= np.abs(self.last_bucket[a][:, None] - self.last_bucket[b][None, :]) <= 1
+        return np.where(known, np.clip(corr, -1.0, 1.0), 0.0)
+
+    def size_factor(self, symbol, side, notional, positions, budget_positions):
+        # Частка повного розміру (0..1) для нової позиції та причина, якщо її зменшено.
+        # positions: [(symbol, side, notional)] уже відкритих. Бюджет - дисперсія
+        # budget_positions незалежних позицій повного розміру з медіанною волатильністю
+        # відомих пар: спільна мірка для всіх кандидатів, тож тихі пари не блокуються
+        with self.lock:
+            row = self.index.get(symbol)
+            if row is None or not self.vol[row] > 0:
+                return 1.0, None
+            held = [(self.index[s], 1.0 if d == "LONG" else -1.0, n)
+                    for s, d, n in positions if s in self.index and s != symbol and self.vol[self.index[s]] > 0]
+            if not held:
+                return 1.0, None
+            rows = [r for r, _, _ in held]
+            signs = np.array([s for _, s, _ in held])
+            weights = signs * np.array([n for _, _, n in held]) * self.vol[rows]
+            sign = 1.0 if side == "LONG" else -1.0
+            weight = notional * self.vol[row]
+            vols = self.vol[:len(self.index)]
+            reference = notional * float(np.median(vols[vols > 0]))
+            corr = self._corr([row], rows)[0]
+            held_corr = self._corr(rows, rows)
+        np.fill_diagonal(held_corr, 1.0)
+
+        same = sign * signs * corr
+        worst = int(np.argmax(same))
+        if same[worst] >= self.max_correlation:
+            names = {r: s for s, r in self.index.items()}
+            return 0.0, f"кореляція {same[worst]:.2f} з {names[rows[worst]]}"
+
+        # σ²(портфель + k·кандидат) = σ²p + k²w² + 2kw·m ≤ B²
+        variance = float(weights @ held_corr @ weights)
+        marginal = float(sign * (weights @ corr))
+        budget = budget_positions * reference ** 2
+        disc = marginal ** 2 - (variance - budget)
+        factor = (-marginal + math.sqrt(disc)) / weight if disc >= 0 else 0.0
+        if factor < self.min_size:
+            return 0.0, f"ризик портфеля вичерпано ({math.sqrt(variance) / reference:.1f} з {math.sqrt(budget_positions):.1f} позицій)"
+        if factor < 1.0:
+            return float(factor), f"ризик портфеля, розмір {factor:.0%}"
+        return 1.0, None
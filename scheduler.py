@@ -0,0 +1,81 @@
+import math
+import threading
+import time
+
+from signals import STRATEGY
+
+# Ваги складових пріоритету
+WEIGHTS = {
+    "fresh": 1.0,
+    "proximity": 1.0,
+    "volume": 1.0,
+    "age": 1.0,
+}
+# Розрив EMA9/EMA21 (% ціни), на якому близькість до сигналу падає до ~0.37
+EMA_GAP_SCALE = 0.3
+
+
+def snapshot_score(last, strategy=STRATEGY):
+    # Наскільки пара близька до входу: EMA9≈EMA21 або вже розійшлися в бік
+    # тренду, RSI у смузі входу, об'єм вище середнього
+    close = last.get("close")
+    ema9, ema21, rsi = last.get("EMA9"), last.get("EMA21"), last.get("RSI")
+    volume, vol_ema = last.get("volume"), last.get("volume_ema")
+    values = (close, ema9, ema21, rsi, volume, vol_ema)
+    if any(v is None or v != v for v in values) or close <= 0:
+        return 0.0, 0.0
+
+    gap = abs(ema9 - ema21) / close * 100
+    proximity = math.exp(-gap / EMA_GAP_SCALE)
+    if ema9 > ema21 and strategy["rsi_long_min"] < rsi < strategy["rsi_long_max"]:
+        proximity += 0.5
+    elif ema9 < ema21 and strategy["rsi_short_min"] < rsi < strategy["rsi_short_max"]:
+        proximity += 0.5
+    surge = min(volume / vol_ema, 3 * strategy["volume_factor"]) / (3 * strategy["volume_factor"]) if vol_ema > 0 else 0.0
+    return proximity / 1.5, surge
+
+
+class ScanScheduler:
+    # Порядок скану за пріоритетом. Давно не переглянуті пари набирають
+    # бонус за очікування, тому жодна не голодує, а "гарячі" повертаються частіше
+    def __init__(self, aging_seconds=300.0):
+        self.aging_seconds = aging_seconds
+        self.state = {}
+        self.lock = threading.Lock()
+
+    def priority(self, symbol, current=None):
+        current = current or time.time()
+        entry = self.state.get(symbol)
+        if entry is None:
+            return math.inf
+        age = min((current - entry["evaluated_at"]) / self.aging_seconds, 2.0)
+        return entry["score"] + WEIGHTS["age"] * age
+
+    def order(self, symbols, budget=None):
+        current = time.time()
+        ranked = sorted(symbols, key=lambda s: -self.priority(s, current))
+        return ranked[:budget] if budget else ranked
+
+    def score(self, symbol):
+        entry = self.state.get(symbol)
+        return entry["score"] if entry else 0.0
+
+    def record(self, symbol, snapshot):
+        if snapshot is None:
+            score, candle_ts = 0.0, None
+        else:
+            last = snapshot[0]
+            proximity, surge = snapshot_score(last)
+            candle_ts = last.get("timestamp")
+            previous = self.state.get(symbol)
+            # Нова свічка з моменту минулого перегляду - пара актуальніша
+            fresh = 1.0 if previous is None or candle_ts != previous["candle_ts"] else 0.0
+            score = WEIGHTS["fresh"] * fresh + WEIGHTS["proximity"] * proximity + WEIGHTS["volume"] * surge
+        with self.lock:
+            self.state[symbol] = {"score": score, "candle_ts": candle_ts, "evaluated_at": time.time()}
+
+    def forget(self, keep):
+        keep = set(keep)
+        with self.lock:
+            for symbol in [s for s in self.state if s not in keep]:
+                del self.state[symbol]
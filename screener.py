@@ -0,0 +1,61 @@
+import numpy as np
+
+# Ваги ознак у підсумковому рейтингу (перцентилі 0..1)
+WEIGHTS = {
+    "turnover": 0.5,
+    "range": 0.3,
+    "spread": 0.2,
+}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def ticker_matrix(tickers, symbols):
+    # symbols × (оборот, спред %, діапазон %) з одного масового fetch_tickers
+    M = np.full((len(symbols), 3), np.nan)
+    for i, symbol in enumerate(symbols):
+        t = tickers.get(symbol)
+        if not t:
+            continue
+        info = t.get("info") or {}
+        turnover = _number(t.get("quoteVolume") or info.get("turnover24h"))
+        bid, ask, last = _number(t.get("bid")), _number(t.get("ask")), _number(t.get("last"))
+        high, low = _number(t.get("high")), _number(t.get("low"))
+        mid = (bid + ask) / 2
+        M[i, 0] = turnover
+        M[i, 1] = (ask - bid) / mid * 100 if mid > 0 else np.nan
+        M[i, 2] = (high - low) / last * 100 if last > 0 else np.nan
+    return M
+
+
+def percentile_rank(values):
+    order = values.argsort(kind="stable")
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(len(values))
+    return ranks / max(1, len(values) - 1)
+
+
+def rank_symbols(tickers, symbols, top_n, min_turnover=0.0, max_spread_percent=None):
+    # Дешевий відсів перед завантаженням свічок: ліквідні пари з вузьким
+    # спредом і живим рухом. Повертає не більше top_n символів, найкращі першими
+    symbols = list(symbols)
+    M = ticker_matrix(tickers, symbols)
+    turnover, spread, price_range = M[:, 0], M[:, 1], M[:, 2]
+    valid = ~np.isnan(M).any(axis=1) & (turnover >= min_turnover) & (spread >= 0)
+    if max_spread_percent is not None:
+        valid &= spread <= max_spread_percent
+    idx = np.flatnonzero(valid)
+    if len(idx) == 0:
+        return []
+    score = (WEIGHTS["turnover"] * percentile_rank(np.log10(turnover[idx] + 1))
+             + WEIGHTS["range"] * percentile_rank(price_range[idx])
+             + WEIGHTS["spread"] * (1 - percentile_rank(spread[idx])))
+    best = idx[np.argsort(-score, kind="stable")]
+    if top_n:
+        best = best[:top_n]
+    return [symbols[i] for i in best]
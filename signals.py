@@ -0,0 +1,118 @@
+import numpy as np
+
+FEATURES = ["open", "close", "prev_close", "volume", "EMA9", "EMA21", "EMA200", "RSI", "volume_ema", "ATR"]
+F = {name: i for i, name in enumerate(FEATURES)}
+
+MIN_SL_PERCENT = 0.3
+
+STRATEGY = {
+    "volume_factor": 1.1,
+    "rsi_long_min": 45,
+    "rsi_long_max": 80,
+    "rsi_short_min": 20,
+    "rsi_short_max": 55,
+    "tp_atr_mult": 3.0,
+    "sl_atr_mult": 1.5,
+}
+
+
+def adaptive_windows(timeframe):
+    # (ATR_WINDOW, RSI_WINDOW, HISTORY_LIMIT) для таймфрейму
+    if timeframe == "1m":
+        return 7, 3, 150
+    if timeframe == "3m":
+        return 10, 4, 200
+    return 14, 5, 250
+
+
+def stack_features(rows):
+    # rows: список (last, prev) -> матриця символи × ознаки
+    X = np.empty((len(rows), len(FEATURES)), dtype=np.float64)
+    for i, (last, prev) in enumerate(rows):
+        for j, name in enumerate(FEATURES):
+            if name == "prev_close":
+                X[i, j] = prev["close"] if prev is not None else np.nan
+            else:
+                X[i, j] = last[name]
+    return X
+
+
+def entry_masks(X, strategy=STRATEGY):
+    close = X[:, F["close"]]
+    open_ = X[:, F["open"]]
+    prev_close = X[:, F["prev_close"]]
+    ema9 = X[:, F["EMA9"]]
+    ema21 = X[:, F["EMA21"]]
+    ema200 = X[:, F["EMA200"]]
+    rsi = X[:, F["RSI"]]
+    volume = X[:, F["volume"]]
+    vol_ema = X[:, F["volume_ema"]]
+
+    valid = ~np.isnan(X[:, [F["EMA9"], F["EMA21"], F["EMA200"], F["RSI"], F["volume_ema"], F["prev_close"]]]).any(axis=1)
+    valid &= ~(volume < vol_ema * strategy["volume_factor"])
+
+    long_mask = (valid & (ema9 > ema21) & (close > ema200) & (close > open_)
+                 & (rsi > strategy["rsi_long_min"]) & (rsi < strategy["rsi_long_max"]) & (prev_close < close))
+    short_mask = (valid & (ema9 < ema21) & (close < ema200) & (close < open_)
+                  & (rsi < strategy["rsi_short_max"]) & (rsi > strategy["rsi_short_min"]) & (prev_close > close))
+    return long_mask, short_mask & ~long_mask
+
+
+def exit_mask(X, is_long):
+    ema9 = X[:, F["EMA9"]]
+    ema21 = X[:, F["EMA21"]]
+    rsi = X[:, F["RSI"]]
+    valid = ~np.isnan(X[:, [F["EMA9"], F["EMA21"], F["RSI"]]]).any(axis=1)
+    long_exit = (ema9 < ema21) | (rsi < 30)
+    short_exit = (ema9 > ema21) | (rsi > 70)
+    return valid & np.where(is_long, long_exit, short_exit)
+
+
+def entry_rule(last, prev, strategy=STRATEGY):
+    # Посимвольний еталон entry_masks: ті самі умови для одного рядка (last, prev)
+    if prev is None:
+        return None
+    values = [last["EMA9"], last["EMA21"], last["EMA200"], last["RSI"], last["volume_ema"], prev["close"]]
+    if any(v != v for v in values):
+        return None
+    if last["volume"] < last["volume_ema"] * strategy["volume_factor"]:
+        return None
+    close, open_, ema9, ema21, rsi = last["close"], last["open"], last["EMA9"], last["EMA21"], last["RSI"]
+    if (ema9 > ema21 and close > last["EMA200"] and close > open_
+            and strategy["rsi_long_min"] < rsi < strategy["rsi_long_max"] and prev["close"] < close):
+        return "LONG"
+    if (ema9 < ema21 and close < last["EMA200"] and close < open_
+            and strategy["rsi_short_min"] < rsi < strategy["rsi_short_max"] and prev["close"] > close):
+        return "SHORT"
+    return None
+
+
+def exit_rule(last, is_long):
+    # Посимвольний еталон exit_mask
+    ema9, ema21, rsi = last["EMA9"], last["EMA21"], last["RSI"]
+    if ema9 != ema9 or ema21 != ema21 or rsi != rsi:
+        return False
+    if is_long:
+        return bool(ema9 < ema21 or rsi < 30)
+    return bool(ema9 > ema21 or rsi > 70)
+
+
+def trend_mask(X, is_long):
+    # Підтвердження старшим таймфреймом: EMA9/EMA21 у бік угоди
+    ema9 = X[:, F["EMA9"]]
+    ema21 = X[:, F["EMA21"]]
+    valid = ~np.isnan(ema9) & ~np.isnan(ema21)
+    return valid & np.where(is_long, ema9 > ema21, ema9 < ema21)
+
+
+def tp_sl_percent(price, atr, min_profit_percent, strategy=STRATEGY):
+    # Працює і для скалярів, і для масивів (бектест)
+    price = np.asarray(price, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    valid = ~np.isnan(atr) & (atr > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tp_atr = np.where(valid, atr / price * 100 * strategy["tp_atr_mult"], np.nan)
+        sl_atr = np.where(valid, atr / price * 100 * strategy["sl_atr_mult"], np.nan)
+    tp = np.where(np.isnan(tp_atr), min_profit_percent, np.maximum(min_profit_percent, tp_atr))
+    sl = np.where(np.isnan(sl_atr), MIN_SL_PERCENT, np.maximum(MIN_SL_PERCENT, sl_atr))
+    return tp, sl
@@ -0,0 +1,181 @@
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+
+from clock import now
+
+try:
+    import websocket
+    TIMEOUT_ERRORS = (websocket.WebSocketTimeoutException, TimeoutError)
+except ImportError:
+    websocket = None
+    TIMEOUT_ERRORS = (TimeoutError,)
+
+PUBLIC_URL = "wss://stream.bybit.com/v5/public/linear"
+PUBLIC_TESTNET_URL = "wss://stream-testnet.bybit.com/v5/public/linear"
+PRIVATE_URL = "wss://stream.bybit.com/v5/private"
+PRIVATE_TESTNET_URL = "wss://stream-testnet.bybit.com/v5/private"
+
+KLINE_INTERVALS = {
+    "1m": "1", "3m": "3", "5m": "5", "15m": "15", "30m": "30",
+    "1h": "60", "2h": "120", "4h": "240", "6h": "360", "12h": "720", "1d": "D",
+}
+
+PING_INTERVAL = 20
+SUBSCRIBE_CHUNK = 10
+
+
+def available():
+    return websocket is not None
+
+
+class ReplayConnection:
+    # Локальна заміна сокета: програє записані повідомлення (JSONL з полями t, msg)
+    def __init__(self, path, speed=0.0):
+        with open(path, encoding="utf-8") as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+        self.speed = speed
+        self.index = 0
+        self.sent = []
+        self.closed = False
+
+    def send(self, payload):
+        self.sent.append(json.loads(payload))
+
+    def recv(self):
+        if self.closed:
+            raise ConnectionError("replay closed")
+        if self.index >= len(self.records):
+            time.sleep(0.05)
+            raise TimeoutError("replay exhausted")
+        record = self.records[self.index]
+        if self.speed and self.index > 0:
+            time.sleep(max(0.0, (record["t"] - self.records[self.index - 1]["t"]) / self.speed))
+        self.index += 1
+        return json.dumps(record["msg"])
+
+    def close(self):
+        self.closed = True
+
+
+class BybitStream:
+    def __init__(self, url, topics, on_message, on_reconnect=None,
+                 api_key=None, api_secret=None, connect=None, record_path=None, name="stream"):
+        self.url = url
+        self.topics = list(topics)
+        self.on_message = on_message
+        self.on_reconnect = on_reconnect
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.connect = connect or self._connect
+        self.record_path = record_path
+        self.name = name
+        self.running = False
+        self.connected = threading.Event()
+        self.thread = None
+        self.ws = None
+
+    def _connect(self, url):
+        return websocket.create_connection(url, timeout=PING_INTERVAL)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+
+    def _send(self, payload):
+        self.ws.send(json.dumps(payload))
+
+    def _auth(self):
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(
+            self.api_secret.encode(), f"GET/realtime{expires}".encode(), hashlib.sha256
+        ).hexdigest()
+        self._send({"op": "auth", "args": [self.api_key, expires, signature]})
+
+    def _subscribe(self):
+        for i in range(0, len(self.topics), SUBSCRIBE_CHUNK):
+            self._send({"op": "subscribe", "args": self.topics[i:i + SUBSCRIBE_CHUNK]})
+
+    def _record(self, raw):
+        with open(self.record_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"t": time.time(), "msg": json.loads(raw)}) + "\n")
+
+    def _run(self):
+        attempt = 0
+        connected_before = False
+        while self.running:
+            try:
+                self.ws = self.connect(self.url)
+                if self.api_key:
+                    self._auth()
+                self._subscribe()
+                self.connected.set()
+                attempt = 0
+                if connected_before and self.on_reconnect:
+                    print(f"{now()} 🔌 {self.name}: перепідключено, дозавантажую пропущені свічки")
+                    self.on_reconnect()
+                connected_before = True
+                last_ping = time.time()
+                while self.running:
+                    if time.time() - last_ping >= PING_INTERVAL:
+                        self._send({"op": "ping"})
+                        last_ping = time.time()
+                    try:
+                        raw = self.ws.recv()
+                    except TIMEOUT_ERRORS:
+                        continue
+                    if not raw:
+                        raise ConnectionError("порожнє повідомлення")
+                    if self.record_path:
+                        self._record(raw)
+                    message = json.loads(raw)
+                    if message.get("op") == "auth" and not message.get("success", True):
+                        raise ConnectionError(f"auth: {message.get('ret_msg')}")
+                    if "topic" in message:
+                        self.on_message(message)
+            except Exception as e:
+                self.connected.clear()
+                if not self.running:
+                    break
+                attempt += 1
+                delay = min(60, 2 ** min(attempt, 6)) * (0.5 + random.random() / 2)
+                print(f"{now()} ⚠️ {self.name}: з'єднання втрачено ({e}), повтор через {delay:.1f}с")
+                try:
+                    self.ws.close()
+                except Exception:
+                    pass
+                time.sleep(delay)
+
+
+def kline_topics(market_ids, timeframe):
+    interval = KLINE_INTERVALS[timeframe]
+    return [f"kline.{interval}.{market_id}" for market_id in market_ids]
+
+
+def ticker_topics(market_ids):
+    return [f"tickers.{market_id}" for market_id in market_ids]
+
+
+def parse_kline(item):
+    bar = [
+        float(item["start"]),
+        float(item["open"]),
+        float(item["high"]),
+        float(item["low"]),
+        float(item["close"]),
+        float(item["volume"]),
+    ]
+    return bar, bool(item.get("confirm"))
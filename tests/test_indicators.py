@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+
+from indicators import IndicatorState
+
+RSI_WINDOW, ATR_WINDOW = 5, 14
+COLUMNS = ["EMA9", "EMA21", "EMA200", "RSI", "ATR", "volume_ema"]
+
+
+def random_bars(seed, count=400):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, count)))
+    # Плоскі ділянки: перевіряють гілки diff == 0 та незмінного EWM
+    close[50:60] = close[49]
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.001, count)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.001, count)))
+    volume = rng.lognormal(8, 1, count)
+    timestamp = np.arange(count) * 60_000.0
+    return np.column_stack([timestamp, open_, high, low, close, volume])
+
+
+def reference(bars):
+    # Старий шлях бота: DataFrame + ta
+    df = pd.DataFrame(bars, columns=["timestamp", "open", "high", "low", "close", "volume"])
+    return {
+        "EMA9": ta.trend.ema_indicator(df["close"], window=9).to_numpy(),
+        "EMA21": ta.trend.ema_indicator(df["close"], window=21).to_numpy(),
+        "EMA200": ta.trend.ema_indicator(df["close"], window=200).to_numpy(),
+        "RSI": ta.momentum.rsi(df["close"], window=RSI_WINDOW).to_numpy(),
+        "ATR": ta.volatility.AverageTrueRange(df["high"], df["low"], df["close"], window=ATR_WINDOW).average_true_range().to_numpy(),
+        "volume_ema": df["volume"].ewm(span=20).mean().to_numpy(),
+    }
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_update_matches_ta_exactly(seed):
+    bars = random_bars(seed)
+    state = IndicatorState(RSI_WINDOW, ATR_WINDOW)
+    rows = [state.update(bar) for bar in bars]
+    expected = reference(bars)
+    for name in COLUMNS:
+        np.testing.assert_array_equal([row[name] for row in rows], expected[name], err_msg=name)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_revise_last_matches_ta_exactly(seed):
+    # Кожна свічка спершу приходить незавершеною (кілька оновлень), потім остаточною
+    bars = random_bars(seed)
+    rng = np.random.default_rng(seed + 100)
+    state = IndicatorState(RSI_WINDOW, ATR_WINDOW)
+    rows = []
+    for bar in bars:
+        for _ in range(rng.integers(0, 3)):
+            forming = bar.copy()
+            forming[4] *= 1 + rng.normal(0, 0.002)
+            forming[5] *= rng.uniform(0.1, 1.0)
+            state.feed([forming])
+        state.feed([bar])
+        rows.append(state.last)
+    expected = reference(bars)
+    for name in COLUMNS:
+        np.testing.assert_array_equal([row[name] for row in rows], expected[name], err_msg=name)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from indicators import indicator_arrays
+from signals import STRATEGY, entry_masks, entry_rule, exit_mask, exit_rule, stack_features
+
+RSI_WINDOW, ATR_WINDOW = 5, 14
+
+
+def random_rows(seed, count=300):
+    # Випадкова історія -> (last, prev) для кожної свічки після прогріву
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, count)))
+    open_ = np.concatenate(([close[0]], close[:-1])) * (1 + rng.normal(0, 0.001, count))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.001, count)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.001, count)))
+    volume = rng.lognormal(8, 1, count)
+    ind = indicator_arrays(high, low, close, volume, RSI_WINDOW, ATR_WINDOW)
+    bars = [
+        {"open": open_[i], "close": close[i], "volume": volume[i], **{k: v[i] for k, v in ind.items()}}
+        for i in range(count)
+    ]
+    return [(bars[i], bars[i - 1]) for i in range(1, count)]
+
+
+@pytest.mark.parametrize("strategy", [
+    STRATEGY,
+    {**STRATEGY, "volume_factor": 0.8, "rsi_long_min": 30, "rsi_long_max": 95, "rsi_short_min": 5, "rsi_short_max": 70},
+])
+def test_entry_masks_match_reference(strategy):
+    for seed in range(20):
+        rows = random_rows(seed)
+        long_mask, short_mask = entry_masks(stack_features(rows), strategy)
+        expected = [entry_rule(last, prev, strategy) for last, prev in rows]
+        got = ["LONG" if l else "SHORT" if s else None for l, s in zip(long_mask, short_mask)]
+        assert got == expected
+    assert any(expected)
+
+
+def test_exit_mask_matches_reference():
+    for seed in range(20):
+        rows = random_rows(seed)
+        X = stack_features(rows)
+        for is_long in (True, False):
+            mask = exit_mask(X, np.full(len(rows), is_long))
+            assert list(mask) == [exit_rule(last, is_long) for last, _ in rows]
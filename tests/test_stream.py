@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+
+import numpy as np
+
+from candles import CandleBuffer
+from stream import BybitStream, ReplayConnection, kline_topics, parse_kline
+
+TIMEFRAME_MS = 60_000
+START = 1_700_000_040_000
+TOPIC = kline_topics(["BTCUSDT"], "1m")[0]
+
+
+def kline(start, close, volume, confirm):
+    return {
+        "topic": TOPIC,
+        "data": [{
+            "start": start, "open": "100", "high": str(max(100, close)), "low": str(min(100, close)),
+            "close": str(close), "volume": str(volume), "confirm": confirm,
+        }],
+    }
+
+
+def write_replay(path, messages):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, msg in enumerate(messages):
+            f.write(json.dumps({"t": i, "msg": msg}) + "\n")
+    return str(path)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class Harness:
+    # Те саме, що apply_stream_klines у боті: свічка в буфер, закриття - подія
+    def __init__(self, paths):
+        self.buffer = CandleBuffer(10)
+        self.events = []
+        self.lock = threading.Lock()
+        self.connections = []
+        self.paths = list(paths)
+        self.stream = BybitStream("replay://", [TOPIC], self.on_message, self.on_reconnect,
+                                  connect=self.connect, name="test-stream")
+
+    def connect(self, url):
+        connection = ReplayConnection(self.paths.pop(0))
+        self.connections.append(connection)
+        return connection
+
+    def on_message(self, message):
+        for item in message["data"]:
+            bar, confirm = parse_kline(item)
+            with self.lock:
+                self.buffer.merge([bar])
+                if confirm:
+                    self.events.append(("candle_closed", bar[0]))
+
+    def on_reconnect(self):
+        with self.lock:
+            self.events.append(("reconnect", None))
+
+
+def test_replay_applies_forming_and_closed_klines(tmp_path):
+    path = write_replay(tmp_path / "replay.jsonl", [
+        kline(START, 101, 5, False),
+        kline(START, 102, 7, False),
+    ])
+    harness = Harness([path])
+    harness.stream.start()
+    try:
+        assert wait_for(lambda: harness.connections and harness.connections[0].index == 2)
+        with harness.lock:
+            # Свічка, що формується, оновлюється на місці, подій закриття немає
+            assert harness.buffer.view().tolist() == [[START, 100, 102, 100, 102, 7]]
+            assert harness.events == []
+        assert harness.connections[0].sent == [{"op": "subscribe", "args": [TOPIC]}]
+    finally:
+        harness.stream.stop()
+
+
+def test_replay_confirmed_close_and_reconnect(tmp_path):
+    first = write_replay(tmp_path / "first.jsonl", [
+        kline(START, 101, 5, False),
+        kline(START, 99, 8, True),
+    ])
+    second = write_replay(tmp_path / "second.jsonl", [
+        kline(START + TIMEFRAME_MS, 103, 4, True),
+    ])
+    harness = Harness([first, second])
+    harness.stream.start()
+    try:
+        assert wait_for(lambda: ("candle_closed", START) in harness.events)
+        with harness.lock:
+            assert harness.buffer.view().tolist() == [[START, 100, 100, 99, 99, 8]]
+        # Обрив з'єднання: новий сокет, повторна підписка і дозавантаження
+        harness.connections[0].close()
+        assert wait_for(lambda: ("candle_closed", START + TIMEFRAME_MS) in harness.events)
+        with harness.lock:
+            assert harness.events == [
+                ("candle_closed", START),
+                ("reconnect", None),
+                ("candle_closed", START + TIMEFRAME_MS),
+            ]
+            np.testing.assert_array_equal(harness.buffer.view(), [
+                [START, 100, 100, 99, 99, 8],
+                [START + TIMEFRAME_MS, 100, 103, 100, 103, 4],
+            ])
+        assert len(harness.connections) == 2
+        assert harness.connections[1].sent == [{"op": "subscribe", "args": [TOPIC]}]
+    finally:
+        harness.stream.stop()